@@ -1,26 +1,45 @@
 # app.py - Complete AI Expense Parser & Analyst Application
 
 import os
-import json
+import re
 import logging
+import logging.handlers
+import atexit
+import queue
 import traceback
 import time
-from functools import wraps
+import hashlib
+import math
+import copy
+import threading
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps, lru_cache
 from decimal import Decimal
+from datetime import datetime, timedelta
 
 # Flask and related imports
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.exceptions import HTTPException
 from flask_cors import CORS
 
 # Database imports
-from database import init_db, get_db_session, Expense, Insight
+from database import (
+    init_db, get_db_session, remove_db_sessions, Expense, Insight,
+    get_cached_llm_response, store_cached_llm_response
+)
+from sqlalchemy import JSON, bindparam, case, delete, func, insert, lambda_stmt, select, type_coerce
 
 # AI and utility imports - UPDATED FOR VERTEX AI
 import vertexai
 from vertexai.generative_models import GenerativeModel, GenerationConfig
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
-from pydantic import BaseModel, ValidationError
-from typing import List
+from google.api_core import exceptions as google_exceptions
+from tenacity import retry, stop_after_attempt, wait_random_exponential, retry_if_exception_type
+import msgspec
+from cachetools import TTLCache
+import orjson
+from typing import List, Optional
 from enum import Enum
 
 # --- Expense Categories Enum ---
@@ -48,30 +67,96 @@ class ExpenseCategory(Enum):
     @classmethod
     def from_string(cls, category_str: str):
         """Find category from string, case-insensitive."""
-        for category in cls:
-            if category.value.lower() == category_str.lower():
-                return category
-        return cls.MISCELLANEOUS  # Default fallback
+        return cls._LOOKUP.get(category_str.casefold(), cls.MISCELLANEOUS)  # Default fallback
+
+CATEGORIES_TEXT = ", ".join(ExpenseCategory.get_all_categories())
+# Assigned after the class body so it isn't turned into an enum member
+ExpenseCategory._LOOKUP = {category.value.casefold(): category for category in ExpenseCategory}
 
 # --- Application Setup ---
 
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    Serializes jsonify() responses and parses request bodies with orjson.
+    orjson encodes datetimes natively as ISO 8601, so models hand them over as-is.
+    """
+    
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 CORS(app) # Allow all origins for local development
 
-# Initialize the database (creates 'expenses.db' if it doesn't exist)
-with app.app_context():
+# Initialize the database (creates 'expenses.db' if it doesn't exist) on the
+# first request rather than at import time, so importing the app stays cheap.
+_db_initialized = False
+_db_init_lock = threading.Lock()
+
+@app.before_request
+def ensure_db_initialized():
+    global _db_initialized
+    if _db_initialized:
+        return
+    with _db_init_lock:
+        if not _db_initialized:
+            init_db()
+            _db_initialized = True
+
+@app.teardown_appcontext
+def close_db_sessions(exception=None):
+    """Closes the request's scoped sessions; streamed responses keep theirs until the stream ends."""
+    remove_db_sessions()
+
+@app.cli.command("init-db")
+def init_db_command():
+    """Create the database tables."""
     init_db()
+    print("Database initialized.")
 
 # --- Logging Configuration ---
 
+# Request threads only enqueue log records; a background listener does the
+# actual (blocking) writes so slow stderr/disk I/O never stalls a request.
+_log_queue = queue.Queue(-1)
+# Records are formatted when enqueued, so the output handler writes them as-is.
+_log_listener = logging.handlers.QueueListener(_log_queue, logging.StreamHandler())
+_log_listener.start()
+atexit.register(_log_listener.stop)
+
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(funcName)s - %(message)s'
+    format='%(asctime)s - %(levelname)s - %(funcName)s - %(message)s',
+    handlers=[logging.handlers.QueueHandler(_log_queue)]
 )
 logger = logging.getLogger(__name__)
 
 # --- Vertex AI Configuration ---
 
+GEMINI_MODEL_NAME = "gemini-2.5-pro"
+
+# Shared generation settings. These are never mutated, so concurrent calls can reuse them.
+GEN_CFG_TEXT = GenerationConfig(
+    temperature=0.1,  # Keep low for factual analysis and financial calculations
+    max_output_tokens=2048,
+)
+GEN_CFG_JSON = GenerationConfig(
+    temperature=0.1,
+    max_output_tokens=2048,
+    response_mime_type="application/json",
+)
+
+# Bounded pool shared by all requests for concurrent Vertex AI calls. The calls are
+# I/O-bound, so requests fan out onto these threads instead of spawning their own.
+VERTEX_AI_MAX_CONCURRENCY = int(os.environ.get("VERTEX_AI_MAX_CONCURRENCY", "16"))
+vertex_ai_executor = ThreadPoolExecutor(
+    max_workers=VERTEX_AI_MAX_CONCURRENCY,
+    thread_name_prefix="vertex-ai"
+)
+
 model = None
 try:
     # Load GCP configuration from environment variables
@@ -82,7 +167,7 @@ try:
         # Initialize Vertex AI
         vertexai.init(project=PROJECT_ID, location=LOCATION)
         # Use Gemini model through Vertex AI
-        model = GenerativeModel("gemini-2.5-pro")
+        model = GenerativeModel(GEMINI_MODEL_NAME)
         logger.info(f"Vertex AI configured successfully for project {PROJECT_ID} in {LOCATION}")
     else:
         logger.warning("GCP_PROJECT_ID environment variable not set. AI features will be disabled.")
@@ -90,19 +175,50 @@ try:
 except Exception as config_error:
     logger.error(f"Failed to configure Vertex AI: {config_error}")
 
-# --- Data Models (Pydantic for validation) ---
+# --- Data Models (msgspec for validation) ---
 
-class Split(BaseModel):
+class Split(msgspec.Struct, frozen=True):
     participant: str
     amount: float
 
-class LineItem(BaseModel):
+class LineItem(msgspec.Struct):
     description: str
     amount: float
     category: str = ExpenseCategory.MISCELLANEOUS.value  # Default category
     allocation_text: str = ""  # Default to empty string if not provided
     splits: List[Split] = [] # The calculated splits will be added here
 
+class ExtractedItem(msgspec.Struct):
+    """A single item as returned by the item extraction prompt."""
+    description: str
+    amount: float
+    category: str = ExpenseCategory.MISCELLANEOUS.value
+
+class SplitShare(msgspec.Struct):
+    participant: str
+    ratio: float
+
+class SplittingAnalysis(msgspec.Struct):
+    """The split decision returned by the combined expense analysis."""
+    financial_relationship: str = "personal_expense"
+    participants: List[str] = []
+    people_mentioned: List[str] = []
+    splitting_method: str = "personal"
+    split_ratio: List[SplitShare] = []
+    context_analysis: str = ""
+
+class ExpenseAnalysis(msgspec.Struct):
+    """Single-call result covering itemization, item extraction and splitting."""
+    is_detailed: bool
+    items: List[ExtractedItem]
+    splitting: SplittingAnalysis
+    expense_date: Optional[str] = None
+
+class SubQueryAnswer(msgspec.Struct):
+    """One numbered answer from a batched insight prompt."""
+    id: int
+    answer: str
+
 # --- Mock Authentication ---
 
 def require_auth(f):
@@ -128,39 +244,149 @@ def require_auth(f):
 
 # --- Vertex AI Call with Retry Logic ---
 
+@lru_cache(maxsize=32)
+def _get_generative_model(system_instruction: str) -> GenerativeModel:
+    """Returns a GenerativeModel bound to a system instruction, reused across calls."""
+    return GenerativeModel(GEMINI_MODEL_NAME, system_instruction=system_instruction)
+
+# Only transient Vertex AI errors are worth retrying; anything else (bad config,
+# validation errors) fails fast instead of sleeping through every attempt.
+RETRYABLE_VERTEX_ERRORS = (
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.ResourceExhausted,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.InternalServerError,
+    google_exceptions.TooManyRequests,
+)
+
 @retry(
     stop=stop_after_attempt(3),
-    wait=wait_exponential(multiplier=1, min=4, max=10),
-    retry=retry_if_exception_type(Exception)
+    wait=wait_random_exponential(multiplier=0.5, max=8),
+    retry=retry_if_exception_type(RETRYABLE_VERTEX_ERRORS),
+    reraise=True
 )
-def call_vertex_ai_with_retry(prompt: str, system_instruction: str, is_json_output: bool = True) -> str:
+def _generate_content_with_retry(prompt: str, system_instruction: str, is_json_output: bool = True,
+                                 generation_config: Optional[GenerationConfig] = None) -> str:
     """Makes a call to the Vertex AI Gemini API with robust retry logic."""
     if not model:
         raise Exception("Vertex AI model not configured - check GCP_PROJECT_ID")
     
-    full_prompt = f"System: {system_instruction}\n\nUser: {prompt}"
-    
-    # Configure the generation settings
-    generation_config = GenerationConfig(
-        temperature=0.1,  # Keep low for factual analysis and financial calculations
-        max_output_tokens=2048,
-    )
-    
-    # Set response format if JSON is expected
-    if is_json_output:
-        generation_config.response_mime_type = "application/json"
-
-    response = model.generate_content(
-        full_prompt, 
-        generation_config=generation_config
-    )
+    if generation_config is None:
+        generation_config = GEN_CFG_JSON if is_json_output else GEN_CFG_TEXT
+    response = _get_generative_model(system_instruction).generate_content(prompt, generation_config=generation_config)
     
     text_response = response.text.strip()
-    # Clean up the response if it's expected to be JSON
-    if is_json_output:
-        return text_response.lstrip("```json").rstrip("```")
+    # JSON mode normally returns bare JSON; only unwrap a markdown fence if one slipped through
+    if is_json_output and text_response.startswith("```"):
+        return _strip_code_fence(text_response)
     return text_response
 
+def _strip_code_fence(text: str) -> str:
+    """
+    Removes a surrounding ``` or ```json markdown fence.
+    Unlike str.lstrip/rstrip, this never eats characters from the content itself.
+    """
+    body = text.partition("\n")[2].rstrip()
+    if body.endswith("```"):
+        body = body[:-3]
+    return body.strip()
+
+def _extract_json_object(text: str) -> Optional[str]:
+    """
+    Returns the first balanced {...} object in text, or None.
+    Single linear scan that tracks nesting depth and skips braces inside string literals.
+    """
+    start = text.find('{')
+    if start == -1:
+        return None
+    
+    depth = 0
+    in_string = False
+    escaped = False
+    for i in range(start, len(text)):
+        char = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == '{':
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    return None
+
+# --- LLM Response Cache ---
+
+# Responses are near-deterministic (low temperature, fixed output format), so
+# identical requests are served from an in-process LRU backed by SQLite.
+LLM_CACHE_SIZE = 4096
+_llm_response_cache = OrderedDict()
+_llm_response_cache_lock = threading.Lock()
+
+def _llm_cache_key(prompt: str, system_instruction: str, is_json_output: bool,
+                   generation_config: Optional[GenerationConfig] = None) -> str:
+    """Builds a stable cache key from the prompt, system instruction and output mode."""
+    digest = hashlib.sha256()
+    digest.update(hashlib.sha256(system_instruction.encode('utf-8')).digest())
+    digest.update(hashlib.sha256(prompt.encode('utf-8')).digest())
+    digest.update(b'json' if is_json_output else b'text')
+    if generation_config is not None:
+        digest.update(orjson.dumps(generation_config.to_dict(), option=orjson.OPT_SORT_KEYS))
+    return digest.hexdigest()
+
+def _remember_llm_response(cache_key: str, response: str) -> None:
+    """Stores a response in the in-process LRU, evicting the oldest entry when full."""
+    with _llm_response_cache_lock:
+        _llm_response_cache[cache_key] = response
+        _llm_response_cache.move_to_end(cache_key)
+        if len(_llm_response_cache) > LLM_CACHE_SIZE:
+            _llm_response_cache.popitem(last=False)
+
+def call_vertex_ai_with_retry(prompt: str, system_instruction: str, is_json_output: bool = True,
+                              generation_config: Optional[GenerationConfig] = None) -> str:
+    """
+    Cached entry point for Vertex AI calls.
+    Checks the in-process LRU, then the SQLite cache, and only calls Gemini on a miss.
+    A custom generation_config (e.g. with a response schema) overrides the default one.
+    """
+    cache_key = _llm_cache_key(prompt, system_instruction, is_json_output, generation_config)
+
+    with _llm_response_cache_lock:
+        response = _llm_response_cache.get(cache_key)
+        if response is not None:
+            _llm_response_cache.move_to_end(cache_key)
+    if response is not None:
+        logger.info(f"LLM cache hit (memory): {cache_key[:12]}")
+        return response
+
+    try:
+        response = get_cached_llm_response(cache_key)
+    except Exception as e:
+        logger.warning(f"LLM cache lookup failed: {e}")
+        response = None
+
+    if response is not None:
+        logger.info(f"LLM cache hit (disk): {cache_key[:12]}")
+    else:
+        logger.info(f"LLM cache miss: {cache_key[:12]}")
+        response = _generate_content_with_retry(prompt, system_instruction, is_json_output, generation_config)
+        if not response:
+            return response  # Never cache empty responses
+        try:
+            store_cached_llm_response(cache_key, response)
+        except Exception as e:
+            logger.warning(f"LLM cache store failed: {e}")
+
+    _remember_llm_response(cache_key, response)
+    return response
+
 # --- AI Tooling Functions ---
 
 def detect_detailed_itemized_expense(text: str) -> bool:
@@ -188,22 +414,7 @@ Answer: YES or NO"""
         logger.error(f"Error detecting itemized expense: {e}")
         return False
 
-def extract_individual_items(text: str) -> List[dict]:
-    """
-    Use AI to extract individual items with prices and categories from detailed expense text.
-    """
-    categories_list = ExpenseCategory.get_all_categories()
-    categories_text = ", ".join(categories_list)
-    
-    prompt = f"""Extract all individual items with their prices and categories from this expense text: "{text}"
-
-List each item separately with its price and category. Be specific and include quantities where mentioned.
-
-Available categories: {categories_text}
-
-Return as JSON array of items:"""
-
-    system_instruction = f"""Extract individual items, prices, and categories from the expense text. Return a JSON array:
+ITEM_EXTRACTION_SYSTEM_INSTRUCTION = f"""Extract individual items, prices, and categories from the expense text. Return a JSON array:
 [
     {{
         "description": "5kg basmati rice",
@@ -218,7 +429,7 @@ Return as JSON array of items:"""
 ]
 
 Available categories:
-{categories_text}
+{CATEGORIES_TEXT}
 
 CATEGORIZATION RULES:
 - Food & Dining: Restaurant meals, takeout, cafes, food delivery
@@ -240,23 +451,45 @@ Rules:
 - Choose the most appropriate category for each item
 - If unsure about category, use Miscellaneous"""
 
+def extract_individual_items(text: str) -> List[dict]:
+    """
+    Use AI to extract individual items with prices and categories from detailed expense text.
+    """
+    prompt = f"""Extract all individual items with their prices and categories from this expense text: "{text}"
+
+List each item separately with its price and category. Be specific and include quantities where mentioned.
+
+Available categories: {CATEGORIES_TEXT}
+
+Return as JSON array of items:"""
+
+    system_instruction = ITEM_EXTRACTION_SYSTEM_INSTRUCTION
+
     try:
         response = call_vertex_ai_with_retry(prompt, system_instruction, is_json_output=True)
-        items = json.loads(response)
         
-        # Validate the items
-        validated_items = []
-        for item in items:
-            if isinstance(item, dict) and 'description' in item and 'amount' in item:
-                # Validate and set category
-                category = item.get('category', ExpenseCategory.MISCELLANEOUS.value)
-                validated_category = ExpenseCategory.from_string(category).value
-                
-                validated_items.append({
-                    'description': str(item['description']),
-                    'amount': float(item['amount']),
-                    'category': validated_category
-                })
+        try:
+            # Parse and validate the whole array in a single pass
+            items = msgspec.json.decode(response, type=List[ExtractedItem], strict=False)
+        except msgspec.ValidationError as e:
+            # One malformed entry shouldn't discard the rest - validate item by item
+            logger.warning(f"Item list failed validation ({e}), validating items individually")
+            items = []
+            for raw_item in msgspec.json.decode(response):
+                try:
+                    items.append(msgspec.convert(raw_item, ExtractedItem, strict=False))
+                except msgspec.ValidationError:
+                    continue
+        
+        # Validate categories against the known set
+        validated_items = [
+            {
+                'description': item.description,
+                'amount': item.amount,
+                'category': ExpenseCategory.from_string(item.category).value
+            }
+            for item in items
+        ]
         
         logger.info(f"Extracted {len(validated_items)} items with categories")
         return validated_items
@@ -264,16 +497,149 @@ Rules:
         logger.error(f"Error extracting individual items: {e}")
         return []
 
-def determine_splits_for_items(text: str, items: List[dict]) -> dict:
+SPLIT_ANALYSIS_SYSTEM_INSTRUCTION = """Analyze the expense context to determine if it's personal or shared. Return JSON:
+
+{
+    "participants": ["me"],
+    "clean_participants": [],
+    "is_shared": false,
+    "expense_type": "personal",
+    "splitting_method": "personal",
+    "split_ratio": {"me": 1.0},
+    "context_analysis": "Detailed explanation of why this classification was chosen",
+    "people_mentioned": ["list of all people mentioned"],
+    "financial_relationship": "personal_expense" or "shared_expense" or "context_only"
+}
+
+CLASSIFICATION RULES:
+
+PERSONAL EXPENSE (is_shared = false):
+- I'm paying FOR other people (treating, gifting, covering)
+- Others mentioned for context but don't contribute financially
+- Examples: "bought coffee for John", "team lunch on me", "groceries for roommate"
+- Result: Only "me" in participants, I pay 100%
+
+SHARED EXPENSE (is_shared = true):  
+- Multiple people will actually pay/contribute their portions
+- Clear cost-sharing arrangement mentioned
+- Examples: "split with John", "John owes me half", "we each pay"
+- Result: Multiple people in participants with split ratios
+
+CRITICAL: Don't assume sharing just because people are mentioned. Analyze the financial intent!
+
+financial_relationship options:
+- "personal_expense": I pay for others
+- "shared_expense": We split costs  
+- "context_only": People mentioned but no financial involvement"""
+
+# Text patterns used by the split-analysis fallback, compiled once so each check
+# is a single scan over the expense text.
+# Strong indicators for personal expense (paying FOR others)
+PERSONAL_INDICATORS_RE = re.compile("|".join(map(re.escape, [
+    'for ', ' for', 'bought for', 'treating', 'paid for', 'lunch for', 'dinner for', 'coffee for'
+])))
+# Strong indicators for shared expense (splitting WITH others)
+SHARED_INDICATORS_RE = re.compile("|".join(map(re.escape, [
+    'split with', 'divide with', 'owes me', 'each pay', 'we split', 'share with', 'between us'
+])))
+
+def normalize_splitting_info(splitting_info: dict) -> dict:
     """
-    Use AI to determine how each item should be split among participants.
+    Validate an AI splitting analysis and force it to be internally consistent.
     """
-    items_text = "\n".join([f"- {item['description']}: ₹{item['amount']}" for item in items])
+    # Validation based on financial relationship analysis
+    financial_relationship = splitting_info.get('financial_relationship', 'personal_expense')
+    participants = splitting_info.get('participants', ['me'])
+    
+    logger.info(f"AI analysis - Financial relationship: {financial_relationship}")
+    logger.info(f"AI analysis - People mentioned: {splitting_info.get('people_mentioned', [])}")
+    logger.info(f"AI analysis - Context: {splitting_info.get('context_analysis', 'N/A')}")
+    
+    # Force consistency based on financial relationship
+    if financial_relationship == 'personal_expense' or financial_relationship == 'context_only':
+        # Personal expense - only "me" pays regardless of people mentioned
+        splitting_info.update({
+            'participants': ['me'],
+            'clean_participants': [],
+            'is_shared': False,
+            'expense_type': 'personal',
+            'splitting_method': 'personal',
+            'split_ratio': {'me': 1.0}
+        })
+        logger.info("Classified as PERSONAL: I pay for everything")
+        
+    elif financial_relationship == 'shared_expense':
+        # Shared expense - multiple people contribute
+        if len(participants) == 1:
+            # AI said shared but only listed "me" - try to extract other participants
+            people_mentioned = splitting_info.get('people_mentioned', [])
+            other_people = [p for p in people_mentioned if p.lower() not in ['me', 'myself', 'i']]
+            
+            if other_people:
+                participants = ['me'] + other_people[:2]  # Limit to avoid too many participants
+                splitting_info['participants'] = participants
+                logger.info(f"Added participants from people_mentioned: {participants}")
+            else:
+                # Fallback to personal if no other people found
+                logger.warning("Shared expense but no other participants found - defaulting to personal")
+                splitting_info.update({
+                    'participants': ['me'],
+                    'clean_participants': [],
+                    'is_shared': False,
+                    'expense_type': 'personal',
+                    'splitting_method': 'personal',
+                    'split_ratio': {'me': 1.0}
+                })
+                return splitting_info
+        
+        # Update for shared expense
+        clean_participants = [p for p in participants if p != 'me']
+        splitting_info.update({
+            'clean_participants': clean_participants,
+            'is_shared': True,
+            'expense_type': 'shared'
+        })
+        
+        # Set equal split ratios for shared expenses
+        if splitting_info.get('splitting_method') == 'equal_split' or not splitting_info.get('split_ratio'):
+            equal_ratio = 1.0 / len(participants)
+            split_ratio = {p: equal_ratio for p in participants}
+            splitting_info['split_ratio'] = split_ratio
+            splitting_info['splitting_method'] = 'equal_split'
+            logger.info(f"Set equal split ratios for shared expense: {split_ratio}")
+    
+    # Final validation of split_ratio
+    if 'split_ratio' in splitting_info:
+        split_ratio = splitting_info['split_ratio']
+        participants = splitting_info.get('participants', ['me'])
+        
+        # Give missing participants an equal share and total the ratios in one pass
+        default_ratio = 1.0 / len(participants) if participants else 0.0
+        ratios = [split_ratio.get(participant, default_ratio) for participant in participants]
+        total_ratio = sum(ratios)
+        
+        # Normalize ratios to sum to 1.0
+        if total_ratio > 0:
+            splitting_info['split_ratio'] = {
+                participant: ratio / total_ratio for participant, ratio in zip(participants, ratios)
+            }
+        else:
+            splitting_info['split_ratio'] = dict(zip(participants, ratios))
     
-    prompt = f"""Original expense text: "{text}"
+    logger.info(f"Final classification: {splitting_info.get('expense_type')} expense with participants: {splitting_info.get('participants')}")
+    return splitting_info
+
+# The split decision depends only on the expense text, so repeated texts
+# (e.g. a daily "coffee 120") reuse the earlier analysis.
+SPLIT_CACHE_SIZE = 2048
 
-Items found:
-{items_text}
+@lru_cache(maxsize=SPLIT_CACHE_SIZE)
+def _splits_from_text(normalized_text: str) -> dict:
+    """
+    Run the AI split analysis for whitespace-normalized text.
+    Raises on failure so that heuristic fallbacks are never cached.
+    """
+    prompt = f"""Original expense text: "{normalized_text}"
 
 CONTEXT ANALYSIS - WHY are other people mentioned? Analyze step by step:
 
@@ -309,126 +675,19 @@ CONTEXT ANALYSIS - WHY are other people mentioned? Analyze step by step:
    - If we're splitting/sharing costs → SHARED (multiple people pay)
    - If unclear → Default to PERSONAL unless clear sharing intent"""
 
-    system_instruction = """Analyze the expense context to determine if it's personal or shared. Return JSON:
-
-{
-    "participants": ["me"],
-    "clean_participants": [],
-    "is_shared": false,
-    "expense_type": "personal",
-    "splitting_method": "personal",
-    "split_ratio": {"me": 1.0},
-    "context_analysis": "Detailed explanation of why this classification was chosen",
-    "people_mentioned": ["list of all people mentioned"],
-    "financial_relationship": "personal_expense" or "shared_expense" or "context_only"
-}
-
-CLASSIFICATION RULES:
-
-PERSONAL EXPENSE (is_shared = false):
-- I'm paying FOR other people (treating, gifting, covering)
-- Others mentioned for context but don't contribute financially
-- Examples: "bought coffee for John", "team lunch on me", "groceries for roommate"
-- Result: Only "me" in participants, I pay 100%
-
-SHARED EXPENSE (is_shared = true):  
-- Multiple people will actually pay/contribute their portions
-- Clear cost-sharing arrangement mentioned
-- Examples: "split with John", "John owes me half", "we each pay"
-- Result: Multiple people in participants with split ratios
-
-CRITICAL: Don't assume sharing just because people are mentioned. Analyze the financial intent!
-
-financial_relationship options:
-- "personal_expense": I pay for others
-- "shared_expense": We split costs  
-- "context_only": People mentioned but no financial involvement"""
+    system_instruction = SPLIT_ANALYSIS_SYSTEM_INSTRUCTION
+    
+    response = call_vertex_ai_with_retry(prompt, system_instruction, is_json_output=True)
+    return normalize_splitting_info(orjson.loads(response))
 
+def determine_splits_for_items(text: str, items: List[dict]) -> dict:
+    """
+    Use AI to determine how each item should be split among participants.
+    The decision is made from the text alone; items are accepted for API compatibility.
+    """
     try:
-        response = call_vertex_ai_with_retry(prompt, system_instruction, is_json_output=True)
-        splitting_info = json.loads(response)
-        
-        # Validation based on financial relationship analysis
-        financial_relationship = splitting_info.get('financial_relationship', 'personal_expense')
-        participants = splitting_info.get('participants', ['me'])
-        
-        logger.info(f"AI analysis - Financial relationship: {financial_relationship}")
-        logger.info(f"AI analysis - People mentioned: {splitting_info.get('people_mentioned', [])}")
-        logger.info(f"AI analysis - Context: {splitting_info.get('context_analysis', 'N/A')}")
-        
-        # Force consistency based on financial relationship
-        if financial_relationship == 'personal_expense' or financial_relationship == 'context_only':
-            # Personal expense - only "me" pays regardless of people mentioned
-            splitting_info.update({
-                'participants': ['me'],
-                'clean_participants': [],
-                'is_shared': False,
-                'expense_type': 'personal',
-                'splitting_method': 'personal',
-                'split_ratio': {'me': 1.0}
-            })
-            logger.info("Classified as PERSONAL: I pay for everything")
-            
-        elif financial_relationship == 'shared_expense':
-            # Shared expense - multiple people contribute
-            if len(participants) == 1:
-                # AI said shared but only listed "me" - try to extract other participants
-                people_mentioned = splitting_info.get('people_mentioned', [])
-                other_people = [p for p in people_mentioned if p.lower() not in ['me', 'myself', 'i']]
-                
-                if other_people:
-                    participants = ['me'] + other_people[:2]  # Limit to avoid too many participants
-                    splitting_info['participants'] = participants
-                    logger.info(f"Added participants from people_mentioned: {participants}")
-                else:
-                    # Fallback to personal if no other people found
-                    logger.warning("Shared expense but no other participants found - defaulting to personal")
-                    splitting_info.update({
-                        'participants': ['me'],
-                        'clean_participants': [],
-                        'is_shared': False,
-                        'expense_type': 'personal',
-                        'splitting_method': 'personal',
-                        'split_ratio': {'me': 1.0}
-                    })
-                    return splitting_info
-            
-            # Update for shared expense
-            clean_participants = [p for p in participants if p != 'me']
-            splitting_info.update({
-                'clean_participants': clean_participants,
-                'is_shared': True,
-                'expense_type': 'shared'
-            })
-            
-            # Set equal split ratios for shared expenses
-            if splitting_info.get('splitting_method') == 'equal_split' or not splitting_info.get('split_ratio'):
-                equal_ratio = 1.0 / len(participants)
-                split_ratio = {p: equal_ratio for p in participants}
-                splitting_info['split_ratio'] = split_ratio
-                splitting_info['splitting_method'] = 'equal_split'
-                logger.info(f"Set equal split ratios for shared expense: {split_ratio}")
-        
-        # Final validation of split_ratio
-        if 'split_ratio' in splitting_info:
-            split_ratio = splitting_info['split_ratio']
-            participants = splitting_info.get('participants', ['me'])
-            
-            # Ensure all participants have a ratio
-            for participant in participants:
-                if participant not in split_ratio:
-                    split_ratio[participant] = 1.0 / len(participants)
-            
-            # Normalize ratios to sum to 1.0
-            total_ratio = sum(split_ratio.values())
-            if total_ratio > 0:
-                for participant in split_ratio:
-                    split_ratio[participant] = split_ratio[participant] / total_ratio
-            
-            splitting_info['split_ratio'] = split_ratio
-        
-        logger.info(f"Final classification: {splitting_info.get('expense_type')} expense with participants: {splitting_info.get('participants')}")
-        return splitting_info
+        # Callers get their own copy so the cached analysis can't be mutated
+        return copy.deepcopy(_splits_from_text(" ".join(text.split())))
         
     except Exception as e:
         logger.error(f"Error determining splits: {e}")
@@ -436,14 +695,8 @@ financial_relationship options:
         # Intelligent fallback - analyze text patterns
         text_lower = text.lower()
         
-        # Strong indicators for personal expense (paying FOR others)
-        personal_indicators = ['for ', ' for', 'bought for', 'treating', 'paid for', 'lunch for', 'dinner for', 'coffee for']
-        
-        # Strong indicators for shared expense (splitting WITH others)  
-        shared_indicators = ['split with', 'divide with', 'owes me', 'each pay', 'we split', 'share with', 'between us']
-        
         # Check for strong personal indicators first
-        if any(indicator in text_lower for indicator in personal_indicators):
+        if PERSONAL_INDICATORS_RE.search(text_lower):
             logger.warning("Fallback: detected 'paying FOR others' pattern - personal expense")
             return {
                 "participants": ["me"],
@@ -456,7 +709,7 @@ financial_relationship options:
             }
         
         # Check for shared indicators
-        elif any(indicator in text_lower for indicator in shared_indicators):
+        elif SHARED_INDICATORS_RE.search(text_lower):
             logger.warning("Fallback: detected sharing pattern - shared expense")
             return {
                 "participants": ["me", "other"],
@@ -481,38 +734,271 @@ financial_relationship options:
                 "context_analysis": "Fallback: default to personal expense"
             }
 
+# --- Combined Expense Analysis ---
+
+# Response schema for the single-call analysis. Gemini's schema format has no
+# dynamic-key maps, so split_ratio comes back as a list of participant/ratio pairs.
+_STRING_LIST_SCHEMA = {"type": "ARRAY", "items": {"type": "STRING"}}
+EXPENSE_ANALYSIS_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "is_detailed": {"type": "BOOLEAN"},
+        "expense_date": {"type": "STRING", "nullable": True},
+        "items": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "description": {"type": "STRING"},
+                    "amount": {"type": "NUMBER"},
+                    "category": {"type": "STRING", "enum": ExpenseCategory.get_all_categories()},
+                },
+                "required": ["description", "amount", "category"],
+            },
+        },
+        "splitting": {
+            "type": "OBJECT",
+            "properties": {
+                "financial_relationship": {
+                    "type": "STRING",
+                    "enum": ["personal_expense", "shared_expense", "context_only"],
+                },
+                "participants": _STRING_LIST_SCHEMA,
+                "people_mentioned": _STRING_LIST_SCHEMA,
+                "splitting_method": {"type": "STRING"},
+                "split_ratio": {
+                    "type": "ARRAY",
+                    "items": {
+                        "type": "OBJECT",
+                        "properties": {
+                            "participant": {"type": "STRING"},
+                            "ratio": {"type": "NUMBER"},
+                        },
+                        "required": ["participant", "ratio"],
+                    },
+                },
+                "context_analysis": {"type": "STRING"},
+            },
+            "required": ["financial_relationship", "participants"],
+        },
+    },
+    "required": ["is_detailed", "items", "splitting"],
+}
+
+GEN_CFG_EXPENSE_ANALYSIS = GenerationConfig(
+    temperature=0.1,
+    max_output_tokens=4096,
+    response_mime_type="application/json",
+    response_schema=EXPENSE_ANALYSIS_SCHEMA,
+)
+
+EXPENSE_ANALYSIS_SYSTEM_INSTRUCTION = f"""You are an expense analyzer. Analyze the expense text in a single pass and return one JSON object with:
+
+- is_detailed: true if the text lists multiple specific items with individual prices that should be broken down separately
+- items: every item with its price and category. If the expense is not itemized, return one general item for the whole amount
+- splitting: whether the expense is personal or shared, and between whom
+- expense_date: the ISO date of the expense if the text mentions one, otherwise null
+
+The response schema takes precedence over the example formats shown in the sections below.
+
+ITEM EXTRACTION:
+{ITEM_EXTRACTION_SYSTEM_INSTRUCTION}
+
+SPLIT ANALYSIS:
+{SPLIT_ANALYSIS_SYSTEM_INSTRUCTION}
+
+Return split_ratio as a list of {{"participant": ..., "ratio": ...}} objects."""
+
+def analyze_expense_text(text: str) -> Optional[ExpenseAnalysis]:
+    """
+    Use one structured AI call to detect itemization, extract items and determine splits.
+    Returns None if the call or validation fails so callers can fall back to the multi-stage parser.
+    """
+    prompt = f'Analyze this expense text: "{text}"'
+    
+    try:
+        response = call_vertex_ai_with_retry(
+            prompt,
+            EXPENSE_ANALYSIS_SYSTEM_INSTRUCTION,
+            is_json_output=True,
+            generation_config=GEN_CFG_EXPENSE_ANALYSIS
+        )
+        return msgspec.json.decode(response, type=ExpenseAnalysis, strict=False)
+    except Exception as e:
+        logger.error(f"Error in combined expense analysis: {e}")
+        return None
+
+# Expense texts analyzed per batched call; small batches keep per-text accuracy up
+MAX_EXPENSE_TEXTS_PER_CALL = 8
+
+GEN_CFG_EXPENSE_BATCH_ANALYSIS = GenerationConfig(
+    temperature=0.1,
+    max_output_tokens=8192,
+    response_mime_type="application/json",
+    response_schema={"type": "ARRAY", "items": EXPENSE_ANALYSIS_SCHEMA},
+)
+
+def analyze_expense_texts(texts: List[str]) -> List[Optional[ExpenseAnalysis]]:
+    """
+    Analyze several expense texts with one structured AI call.
+    Entries are None where the batch result can't be used, so callers can parse those texts individually.
+    """
+    numbered_texts = "\n".join(f'{i}. "{text}"' for i, text in enumerate(texts, 1))
+    prompt = f"""Analyze each of these {len(texts)} numbered expense texts independently.
+Return a JSON array with exactly one analysis per text, in the same order.
+
+{numbered_texts}"""
+    
+    try:
+        response = call_vertex_ai_with_retry(
+            prompt,
+            EXPENSE_ANALYSIS_SYSTEM_INSTRUCTION,
+            is_json_output=True,
+            generation_config=GEN_CFG_EXPENSE_BATCH_ANALYSIS
+        )
+        analyses = msgspec.json.decode(response, type=List[ExpenseAnalysis], strict=False)
+    except Exception as e:
+        logger.error(f"Error in batched expense analysis: {e}")
+        return [None] * len(texts)
+    
+    if len(analyses) != len(texts):
+        logger.warning(f"Batched analysis returned {len(analyses)} results for {len(texts)} texts, discarding")
+        return [None] * len(texts)
+    
+    return [analysis if analysis.items else None for analysis in analyses]
+
+def _build_itemized_result(items: List[dict], splitting_info: dict, expense_date: Optional[str] = None) -> dict:
+    """Create line items with splits for extracted items and wrap them in a parser result."""
+    line_items = []
+    total_amount = 0
+    
+    for item in items:
+        item_amount = item['amount']
+        total_amount += item_amount
+        
+        # Apply splits to the item
+        splits = apply_splits_to_item(item, splitting_info)
+        
+        line_items.append({
+            'description': item['description'],
+            'amount': item_amount,
+            'category': item.get('category', ExpenseCategory.MISCELLANEOUS.value),
+            'allocation_text': splitting_info.get('splitting_explanation', 'Personal expense'),
+            'splits': splits
+        })
+    
+    return {
+        'participants': splitting_info.get('participants', ['me']),
+        'clean_participants': splitting_info.get('clean_participants', []),
+        'is_shared': splitting_info.get('is_shared', False),
+        'expense_type': splitting_info.get('expense_type', 'personal'),
+        'expense_date': expense_date,
+        'line_items': line_items,
+        'total_amount': round(total_amount, 2)
+    }
+
+def build_result_from_analysis(analysis: ExpenseAnalysis) -> dict:
+    """Convert a combined expense analysis into the parser result format."""
+    splitting = analysis.splitting
+    splitting_info = normalize_splitting_info({
+        'financial_relationship': splitting.financial_relationship,
+        'participants': splitting.participants or ['me'],
+        'people_mentioned': splitting.people_mentioned,
+        'splitting_method': splitting.splitting_method,
+        'split_ratio': {share.participant: share.ratio for share in splitting.split_ratio},
+        'context_analysis': splitting.context_analysis
+    })
+    
+    items = [
+        {
+            'description': item.description,
+            'amount': item.amount,
+            'category': ExpenseCategory.from_string(item.category).value
+        }
+        for item in analysis.items
+    ]
+    return _build_itemized_result(items, splitting_info, analysis.expense_date)
+
 def apply_splits_to_item(item: dict, splitting_info: dict) -> List[dict]:
     """
     Apply the splitting strategy to create splits for a single item.
     """
     item_amount = item['amount']
-    splits = []
     
     split_ratio = splitting_info.get('split_ratio', {})
     participants = splitting_info.get('participants', ['me'])
     
-    logger.info(f"Applying splits to '{item['description']}' (₹{item_amount}) with ratio: {split_ratio}")
-    
-    for participant in participants:
-        ratio = split_ratio.get(participant, 0)
-        if ratio > 0:
-            split_amount = round(item_amount * ratio, 2)
-            splits.append({
-                'participant': participant,
-                'amount': split_amount
-            })
-            logger.info(f"  {participant}: ₹{split_amount} ({ratio*100:.1f}%)")
-    
-    # Ensure splits sum to item amount (handle rounding errors)
-    total_splits = sum(split['amount'] for split in splits)
-    if abs(total_splits - item_amount) > 0.01 and splits:
+    logger.debug("Applying splits to '%s' (₹%s) with ratio: %s", item['description'], item_amount, split_ratio)
+    
+    # Resolve the paying participants once, then compute every amount in one pass
+    shares = [(participant, split_ratio.get(participant, 0)) for participant in participants]
+    shares = [(participant, ratio) for participant, ratio in shares if ratio > 0]
+    amounts = [round(item_amount * ratio, 2) for _, ratio in shares]
+    
+    # Ensure splits sum to item amount (handle rounding errors); fsum keeps the
+    # total exact so only genuine rounding drift triggers an adjustment
+    adjustment = item_amount - math.fsum(amounts)
+    if abs(adjustment) > 0.01 and amounts:
         # Adjust the first split to match exact total
-        adjustment = item_amount - total_splits
-        splits[0]['amount'] = round(splits[0]['amount'] + adjustment, 2)
-        logger.info(f"  Adjusted {splits[0]['participant']} by ₹{adjustment:.2f} for rounding")
+        amounts[0] = round(amounts[0] + adjustment, 2)
+        logger.debug("  Adjusted %s by ₹%.2f for rounding", shares[0][0], adjustment)
+    
+    splits = [
+        {'participant': participant, 'amount': split_amount}
+        for (participant, _), split_amount in zip(shares, amounts)
+    ]
+    
+    # Per-participant traces are only formatted when debug logging is on
+    if logger.isEnabledFor(logging.DEBUG):
+        for (participant, ratio), split_amount in zip(shares, amounts):
+            logger.debug("  %s: ₹%.2f (%.1f%%)", participant, split_amount, ratio * 100)
     
     return splits
 
+# Fast path for the common single-item entries like "coffee 120" or "uber ₹340"
+SIMPLE_RE = re.compile(r"^(?P<desc>[a-zA-Z ]{1,40}?)\s*[₹$€]?\s*(?P<amt>\d+(?:\.\d{1,2})?)\s*$")
+# Words that may bring other people into the expense; these always go to the AI
+MULTI_PERSON_CUES_RE = re.compile(
+    r"\b(?:with|for|and|split|share|shared|owes?|half|each|we|us|our|between|divide|treating|paid)\b",
+    re.IGNORECASE
+)
+
+PERSONAL_SPLITTING_INFO = {
+    "participants": ["me"],
+    "clean_participants": [],
+    "is_shared": False,
+    "expense_type": "personal",
+    "splitting_method": "personal",
+    "split_ratio": {"me": 1.0},
+    "context_analysis": "Simple single-item expense"
+}
+
+def parse_simple_expense(text: str) -> Optional[dict]:
+    """
+    Parse a plain "<description> <amount>" expense without calling the AI.
+    Returns None when the text needs the full parser.
+    """
+    match = SIMPLE_RE.match(text.strip())
+    if not match:
+        return None
+    
+    description = match.group('desc').strip()
+    if not description or MULTI_PERSON_CUES_RE.search(description):
+        return None
+    
+    # Without a keyword match the categorizer would store Miscellaneous for good;
+    # let the AI pick the category instead
+    category = categorize_line_item(description)
+    if category == ExpenseCategory.MISCELLANEOUS.value:
+        return None
+    
+    item = {
+        'description': description,
+        'amount': float(match.group('amt')),
+        'category': category
+    }
+    return _build_itemized_result([item], copy.deepcopy(PERSONAL_SPLITTING_INFO))
+
 def tool_intelligent_expense_parser(text: str) -> dict:
     """
     Advanced multi-stage AI-powered expense parser that intelligently handles
@@ -520,56 +1006,44 @@ def tool_intelligent_expense_parser(text: str) -> dict:
     """
     logger.info("Starting intelligent expense parsing...")
     
+    simple_result = parse_simple_expense(text)
+    if simple_result is not None:
+        logger.info("Parsed as a simple single-item expense without AI")
+        return simple_result
+    
+    # Preferred path: a single structured call covering all three decisions
+    analysis = analyze_expense_text(text)
+    if analysis is not None and analysis.items:
+        logger.info(f"Combined analysis: detailed={analysis.is_detailed}, {len(analysis.items)} items")
+        return build_result_from_analysis(analysis)
+    
+    logger.warning("Combined analysis unavailable, falling back to multi-stage parsing")
+    
+    # The splitting decision only needs the original text, so it runs concurrently
+    # with detection (and extraction) instead of after them
+    splits_future = vertex_ai_executor.submit(determine_splits_for_items, text, [])
+    
     # Stage 1: Detect if this is a detailed itemized expense
     is_detailed = detect_detailed_itemized_expense(text)
     logger.info(f"Detailed itemized expense detected: {is_detailed}")
     
+    individual_items = []
     if is_detailed:
-        # Stage 2: Extract individual items
+        # Stage 2: Extract individual items while the splits call is in flight
         individual_items = extract_individual_items(text)
         logger.info(f"Extracted {len(individual_items)} individual items")
-        
-        if individual_items:
-            # Stage 3: Determine splitting strategy
-            splitting_info = determine_splits_for_items(text, individual_items)
-            logger.info(f"Splitting strategy: {splitting_info.get('splitting_method')}")
-            
-            # Stage 4: Create line items with splits
-            line_items = []
-            total_amount = 0
-            
-            for item in individual_items:
-                item_amount = item['amount']
-                total_amount += item_amount
-                
-                # Apply splits to the item
-                splits = apply_splits_to_item(item, splitting_info)
-                
-                line_items.append({
-                    'description': item['description'],
-                    'amount': item_amount,
-                    'category': item.get('category', ExpenseCategory.MISCELLANEOUS.value),
-                    'allocation_text': splitting_info.get('splitting_explanation', 'Personal expense'),
-                    'splits': splits
-                })
-            
-            return {
-                'participants': splitting_info.get('participants', ['me']),
-                'clean_participants': splitting_info.get('clean_participants', []),
-                'is_shared': splitting_info.get('is_shared', False),
-                'expense_type': splitting_info.get('expense_type', 'personal'),
-                'expense_date': None,  # Could add date extraction if needed
-                'line_items': line_items,
-                'total_amount': round(total_amount, 2)
-            }
+    
+    # Stage 3: Determine splitting strategy
+    splitting_info = splits_future.result()
+    logger.info(f"Splitting strategy: {splitting_info.get('splitting_method')}")
+    
+    if individual_items:
+        # Stage 4: Create line items with splits
+        return _build_itemized_result(individual_items, splitting_info)
     
     # Fallback: Use simple parsing for non-detailed expenses
     logger.info("Using simple parsing approach")
     
-    # First, determine splitting strategy using the same robust logic
-    splitting_info = determine_splits_for_items(text, [])
-    logger.info(f"Simple parsing - splitting strategy: {splitting_info.get('splitting_method')}")
-    
     prompt = f"""Parse this expense into line items: "{text}"
 
 Based on the expense description, extract:
@@ -605,11 +1079,27 @@ Rules:
         
         logger.info(f"Attempting to parse JSON response of length: {len(response)}")
         
-        # Try to parse JSON
+        # Try to parse JSON. The model is asked for application/json, so the
+        # recovery scan below only runs when that guarantee didn't hold.
         try:
-            parsed_result = json.loads(response)
+            parsed_result = orjson.loads(response)
             logger.info("Successfully parsed JSON response")
+        except orjson.JSONDecodeError as e:
+            logger.error(f"JSON parsing failed: {e}")
+            logger.error(f"Response content: {response[:500]}")
+            parsed_result = None
             
+            # Try to extract JSON from response if it's wrapped in other text
+            json_str = _extract_json_object(response)
+            if json_str:
+                logger.info("Found JSON pattern in response, attempting to parse...")
+                try:
+                    parsed_result = orjson.loads(json_str)
+                    logger.info("Successfully parsed extracted JSON")
+                except orjson.JSONDecodeError as e2:
+                    logger.error(f"Extracted JSON also failed to parse: {e2}")
+        
+        if parsed_result is not None:
             # Apply splitting to each line item
             line_items = []
             for item_data in parsed_result.get('line_items', []):
@@ -639,80 +1129,34 @@ Rules:
             }
             
             return result
-            
-        except json.JSONDecodeError as e:
-            logger.error(f"JSON parsing failed: {e}")
-            logger.error(f"Response content: {response[:500]}")
-            
-            # Try to extract JSON from response if it's wrapped in other text
-            import re
-            json_match = re.search(r'\{.*\}', response, re.DOTALL)
-            if json_match:
-                json_str = json_match.group()
-                logger.info("Found JSON pattern in response, attempting to parse...")
-                try:
-                    parsed_result = json.loads(json_str)
-                    logger.info("Successfully parsed extracted JSON")
-                    
-                    # Apply same logic as above
-                    line_items = []
-                    for item_data in parsed_result.get('line_items', []):
-                        splits = apply_splits_to_item(item_data, splitting_info)
-                        
-                        # Determine category for the item
-                        description = item_data.get('description', 'Unknown expense')
-                        category = categorize_line_item(description)
-                        
-                        line_items.append({
-                            'description': description,
-                            'amount': item_data.get('amount', 0),
-                            'category': category,
-                            'allocation_text': splitting_info.get('splitting_explanation', 'Personal expense'),
-                            'splits': splits
-                        })
-                    
-                    result = {
-                        'participants': splitting_info.get('participants', ['me']),
-                        'clean_participants': splitting_info.get('clean_participants', []),
-                        'is_shared': splitting_info.get('is_shared', False),
-                        'expense_type': splitting_info.get('expense_type', 'personal'),
-                        'expense_date': parsed_result.get('expense_date'),
-                        'line_items': line_items,
-                        'total_amount': parsed_result.get('total_amount', 0)
-                    }
-                    
-                    return result
-                except json.JSONDecodeError as e2:
-                    logger.error(f"Extracted JSON also failed to parse: {e2}")
-            
-            # Fallback response with proper splitting
-            logger.warning("Returning fallback parsing result due to JSON error")
-            fallback_item = {
-                'description': text[:100] + ("..." if len(text) > 100 else ""),
-                'amount': 0.0
-            }
-            splits = apply_splits_to_item(fallback_item, splitting_info)
-            
-            return {
-                'participants': splitting_info.get('participants', ['me']),
-                'clean_participants': splitting_info.get('clean_participants', []),
-                'is_shared': splitting_info.get('is_shared', False),
-                'expense_type': splitting_info.get('expense_type', 'personal'),
-                'expense_date': None,
-                'line_items': [{
-                    'description': fallback_item['description'],
-                    'amount': fallback_item['amount'],
-                    'category': ExpenseCategory.MISCELLANEOUS.value,
-                    'allocation_text': splitting_info.get('splitting_explanation', 'Fallback expense'),
-                    'splits': splits
-                }],
-                'total_amount': 0.0
-            }
+        
+        # Fallback response with proper splitting
+        logger.warning("Returning fallback parsing result due to JSON error")
+        fallback_item = {
+            'description': text[:100] + ("..." if len(text) > 100 else ""),
+            'amount': 0.0
+        }
+        splits = apply_splits_to_item(fallback_item, splitting_info)
+        
+        return {
+            'participants': splitting_info.get('participants', ['me']),
+            'clean_participants': splitting_info.get('clean_participants', []),
+            'is_shared': splitting_info.get('is_shared', False),
+            'expense_type': splitting_info.get('expense_type', 'personal'),
+            'expense_date': None,
+            'line_items': [{
+                'description': fallback_item['description'],
+                'amount': fallback_item['amount'],
+                'category': ExpenseCategory.MISCELLANEOUS.value,
+                'allocation_text': splitting_info.get('splitting_explanation', 'Fallback expense'),
+                'splits': splits
+            }],
+            'total_amount': 0.0
+        }
     
     except Exception as e:
         logger.error(f"Error in tool_intelligent_expense_parser: {e}")
-        # Create fallback with proper splitting
-        splitting_info = determine_splits_for_items(text, [])
+        # Create fallback with proper splitting (reusing the strategy computed above)
         fallback_item = {
             'description': text[:100] + ("..." if len(text) > 100 else ""),
             'amount': 0.0
@@ -759,25 +1203,44 @@ def create_fallback_expense_result(text: str, error_msg: str) -> dict:
         "total_amount": 0.0
     }
 
-def summarize_expenses_for_analysis(expenses: List[dict], limit: int = 20) -> dict:
+# Summaries are reused across insight queries over the same expenses; callers
+# pass a cache key (user id + expense fingerprint) that changes with the data.
+SUMMARY_CACHE_SIZE = 256
+SUMMARY_CACHE_TTL_SECONDS = 3600
+_expense_summary_cache = TTLCache(maxsize=SUMMARY_CACHE_SIZE, ttl=SUMMARY_CACHE_TTL_SECONDS)
+_expense_summary_cache_lock = threading.Lock()
+
+def summarize_expenses_for_analysis(expenses: List[dict], limit: int = 20, cache_key: tuple = None) -> dict:
     """Summarize expenses data to reduce token usage for insights."""
+    if cache_key is None:
+        return _summarize_expenses(expenses, limit)
+    
+    with _expense_summary_cache_lock:
+        summary = _expense_summary_cache.get((cache_key, limit))
+    if summary is None:
+        summary = _summarize_expenses(expenses, limit)
+        with _expense_summary_cache_lock:
+            _expense_summary_cache[(cache_key, limit)] = summary
+    return summary
+
+def _summarize_expenses(expenses: List[dict], limit: int) -> dict:
     if not expenses:
         return {"summary": "No expenses", "sample_expenses": []}
     
     # Take only recent expenses to limit token usage
     recent_expenses = expenses[:limit]
     
-    # Create summary statistics
-    total_amount = sum(exp.get('total_amount', 0) for exp in recent_expenses)
-    personal_count = len([exp for exp in recent_expenses if exp.get('expense_type') == 'personal'])
-    shared_count = len(recent_expenses) - personal_count
-    
-    # Extract categories and amounts
+    # Create summary statistics, categories and amounts in a single pass
+    total_amount = 0.0
+    personal_count = 0
     categories = {}
     for exp in recent_expenses:
-        for item in exp.get('line_items', []):
+        total_amount += exp.get('total_amount', 0)
+        personal_count += exp.get('expense_type') == 'personal'
+        for item in exp.get('line_items', ()):
             category = categorize_line_item(item.get('description', ''))
             categories[category] = categories.get(category, 0) + item.get('amount', 0)
+    shared_count = len(recent_expenses) - personal_count
     
     # Get sample expenses for context
     sample_expenses = []
@@ -789,14 +1252,28 @@ def summarize_expenses_for_analysis(expenses: List[dict], limit: int = 20) -> di
         })
     
     return {
-        "summary": f"Total: ${total_amount:.2f}, Personal: {personal_count}, Shared: {shared_count}",
+        "summary": f"Total: ₹{total_amount:.2f}, Personal: {personal_count}, Shared: {shared_count}",
         "categories": categories,
         "sample_expenses": sample_expenses,
         "total_expenses_analyzed": len(recent_expenses)
     }
 
-def tool_analyze_expenses_for_insights(query: str, user_expenses: List[dict]) -> str:
-    """Optimized insights analysis with reduced token usage."""
+def format_categories_for_prompt(categories: dict) -> str:
+    """Terse "Category:₹amount" list; much cheaper in tokens than JSON."""
+    return ", ".join(f"{category}:₹{amount:.0f}" for category, amount in categories.items())
+
+def format_samples_for_prompt(sample_expenses: List[dict]) -> str:
+    """Terse "type ₹amount (item/item)" list of sample expenses."""
+    return "; ".join(
+        f"{sample['type']} ₹{sample['amount'] or 0:.0f} ({'/'.join(filter(None, sample['items']))})"
+        for sample in sample_expenses
+    )
+
+def tool_analyze_expenses_for_insights(query: str, user_expenses: List[dict], cache_key: tuple = None) -> str:
+    """
+    Optimized insights analysis with reduced token usage.
+    cache_key identifies this exact set of expenses so their summary can be reused.
+    """
     logger.info(f"Calling tool_analyze_expenses_for_insights for query: '{query}'")
     
     if not user_expenses:
@@ -804,16 +1281,16 @@ def tool_analyze_expenses_for_insights(query: str, user_expenses: List[dict]) ->
     
     # Check if this is a complex query that should be split
     if should_split_insight_query(query):
-        return handle_complex_insight_query(query, user_expenses)
+        return handle_complex_insight_query(query, user_expenses, cache_key)
     
     # Regular single-call analysis
-    expense_summary = summarize_expenses_for_analysis(user_expenses, limit=30)
+    expense_summary = summarize_expenses_for_analysis(user_expenses, limit=INSIGHT_SUMMARY_LIMIT, cache_key=cache_key)
     
     prompt = f"""Question: "{query}"
 
 Expense Summary: {expense_summary['summary']}
-Categories: {json.dumps(expense_summary['categories'], indent=1)}
-Recent samples: {json.dumps(expense_summary['sample_expenses'], indent=1)}
+Categories: {format_categories_for_prompt(expense_summary['categories'])}
+Recent samples: {format_samples_for_prompt(expense_summary['sample_expenses'])}
 Total analyzed: {expense_summary['total_expenses_analyzed']} expenses
 
 IMPORTANT: All monetary amounts must be in Indian Rupees (INR) using the ₹ symbol. Never use $ or USD.
@@ -826,57 +1303,119 @@ Provide insights based on this data."""
     response = call_vertex_ai_with_retry(prompt, system_instruction, is_json_output=False)
     return response
 
+# Keywords that indicate complex multi-part queries
+COMPLEX_QUERY_KEYWORDS = (
+    'compare', 'versus', 'vs', 'trend', 'over time', 
+    'month by month', 'category breakdown', 'detailed analysis',
+    'both', 'and also', 'as well as'
+)
+
 def should_split_insight_query(query: str) -> bool:
     """Determine if a query should be split into multiple calls."""
-    # Keywords that indicate complex multi-part queries
-    complex_keywords = [
-        'compare', 'versus', 'vs', 'trend', 'over time', 
-        'month by month', 'category breakdown', 'detailed analysis',
-        'both', 'and also', 'as well as'
-    ]
-    
     query_lower = query.lower()
-    return any(keyword in query_lower for keyword in complex_keywords) and len(query.split()) > 10
+    return any(keyword in query_lower for keyword in COMPLEX_QUERY_KEYWORDS) and len(query.split()) > 10
+
+# Sub-queries answered per batched call; small batches keep answer quality up
+MAX_BATCHED_SUB_QUERIES = 8
+
+SUB_QUERY_BATCH_SYSTEM_INSTRUCTION = "Provide brief, focused answers. Be concise. Answer every numbered question separately."
+SUB_QUERY_SYSTEM_INSTRUCTION = "Provide a brief, focused answer. Be concise."
+
+class PartialInsightError(Exception):
+    """Raised when some sub-queries of a complex insight failed; carries the partial response."""
+    
+    def __init__(self, partial_response: str):
+        super().__init__("Some insight sub-queries could not be answered")
+        self.partial_response = partial_response
 
-def handle_complex_insight_query(query: str, user_expenses: List[dict]) -> str:
-    """Handle complex queries by splitting into multiple focused calls."""
-    logger.info("Handling complex query with multiple AI calls")
+def handle_complex_insight_query(query: str, user_expenses: List[dict], cache_key: tuple = None) -> str:
+    """
+    Handle complex queries by splitting them into focused sub-queries answered in batched calls.
+    Raises PartialInsightError if any sub-query couldn't be answered.
+    """
+    logger.info("Handling complex query with batched AI calls")
     
     # Split query into focused sub-queries
     sub_queries = split_query_into_parts(query)
     
-    results = []
-    for i, sub_query in enumerate(sub_queries, 1):
-        logger.info(f"Processing sub-query {i}/{len(sub_queries)}: {sub_query}")
-        
-        # Use smaller data sets for each sub-query
-        expense_summary = summarize_expenses_for_analysis(user_expenses, limit=15)
-        
-        prompt = f"""Focus on: "{sub_query}"
-
-Data: {expense_summary['summary']}
-Categories: {json.dumps(expense_summary['categories'], indent=1)}
-
-Brief answer (2-3 sentences):"""
-
-        system_instruction = "Provide a brief, focused answer. Be concise."
-        
-        try:
-            response = call_vertex_ai_with_retry(prompt, system_instruction, is_json_output=False)
-            results.append(f"**{sub_query}**\n{response}")
-        except Exception as e:
-            logger.error(f"Error in sub-query {i}: {e}")
-            results.append(f"**{sub_query}**\nUnable to analyze this aspect.")
+    # All sub-queries share one (smaller) data set
+    expense_summary = summarize_expenses_for_analysis(user_expenses, limit=15, cache_key=cache_key)
+    data_context = f"""Data: {expense_summary['summary']}
+Categories: {format_categories_for_prompt(expense_summary['categories'])}"""
+    
+    answers = {}
+    for start in range(0, len(sub_queries), MAX_BATCHED_SUB_QUERIES):
+        batch = sub_queries[start:start + MAX_BATCHED_SUB_QUERIES]
+        answers.update(answer_sub_queries_batch(batch, data_context, first_id=start + 1))
+    
+    # Fall back to dedicated calls for anything the batch didn't answer; they are
+    # independent and I/O-bound, so they run concurrently on the shared pool
+    fallback_futures = {
+        i: vertex_ai_executor.submit(answer_single_sub_query, sub_query, data_context, i, len(sub_queries))
+        for i, sub_query in enumerate(sub_queries, 1)
+        if i not in answers
+    }
+    failed = False
+    for i, future in fallback_futures.items():
+        answers[i] = future.result()
+        if answers[i] is None:
+            answers[i] = "Unable to analyze this aspect."
+            failed = True
+    
+    results = [f"**{sub_query}**\n{answers[i]}" for i, sub_query in enumerate(sub_queries, 1)]
     
     # Combine results
     final_response = "\n\n".join(results)
     
     # Add summary if multiple parts
     if len(results) > 1:
-        final_response += f"\n\n**Summary:** Based on your {len(expense_summary.get('total_expenses_analyzed', 0))} recent expenses."
+        final_response += f"\n\n**Summary:** Based on your {expense_summary.get('total_expenses_analyzed', 0)} recent expenses."
     
+    if failed:
+        raise PartialInsightError(final_response)
     return final_response
 
+def answer_sub_queries_batch(sub_queries: List[str], data_context: str, first_id: int = 1) -> dict:
+    """
+    Answer several sub-queries with one AI call.
+    Returns a mapping of question number to answer; empty if the response can't be parsed.
+    """
+    numbered_questions = "\n".join(
+        f"{i}. {sub_query}" for i, sub_query in enumerate(sub_queries, first_id)
+    )
+    prompt = f"""Answer each numbered question briefly (2-3 sentences each).
+{numbered_questions}
+
+{data_context}
+
+Return a JSON array with one {{"id": <question number>, "answer": "<answer>"}} object per question."""
+    
+    try:
+        response = call_vertex_ai_with_retry(prompt, SUB_QUERY_BATCH_SYSTEM_INSTRUCTION, is_json_output=True)
+        parsed_answers = msgspec.json.decode(response, type=List[SubQueryAnswer])
+    except Exception as e:
+        logger.error(f"Batched sub-query call failed, falling back to individual calls: {e}")
+        return {}
+    
+    expected_ids = range(first_id, first_id + len(sub_queries))
+    return {entry.id: entry.answer for entry in parsed_answers if entry.id in expected_ids}
+
+def answer_single_sub_query(sub_query: str, data_context: str, index: int, total: int) -> Optional[str]:
+    """Answer one sub-query with its own AI call; None if the call failed."""
+    logger.info(f"Processing sub-query {index}/{total}: {sub_query}")
+    
+    prompt = f"""Focus on: "{sub_query}"
+
+{data_context}
+
+Brief answer (2-3 sentences):"""
+    
+    try:
+        return call_vertex_ai_with_retry(prompt, SUB_QUERY_SYSTEM_INSTRUCTION, is_json_output=False)
+    except Exception as e:
+        logger.error(f"Error in sub-query {index}: {e}")
+        return None
+
 def split_query_into_parts(query: str) -> List[str]:
     """Split a complex query into focused sub-queries."""
     # Simple splitting logic - can be enhanced
@@ -901,6 +1440,156 @@ def split_query_into_parts(query: str) -> List[str]:
     # Default: return original query
     return [query]
 
+# --- Insight Cache ---
+
+# Most recent expenses included in an insight summary
+INSIGHT_SUMMARY_LIMIT = 30
+
+# Insights for the same question over unchanged expenses are reused. Adding an
+# expense changes the fingerprint, so stale answers are never served for new data.
+INSIGHT_CACHE_TTL_SECONDS = 3600
+_insight_cache = TTLCache(maxsize=1024, ttl=INSIGHT_CACHE_TTL_SECONDS)
+_insight_cache_lock = threading.Lock()
+
+def get_expense_fingerprint(db_session, user_id: str) -> tuple:
+    """Returns (count, first id, last id) of a user's expenses with one aggregate query."""
+    count, first_id, last_id = db_session.query(
+        func.count(Expense.id), func.min(Expense.id), func.max(Expense.id)
+    ).filter_by(user_id=user_id).one()
+    return (count, first_id or 0, last_id or 0)
+
+def load_expenses_for_analysis(db_session, user_id: str, limit: int = INSIGHT_SUMMARY_LIMIT) -> List[dict]:
+    """
+    Load the user's most recent expenses, with only the parsed fields the insight summary reads.
+    They are extracted from the stored JSON in SQL, so the rest of each parsed_data document
+    is never decoded, and the summary never looks past `limit` rows so no more are fetched.
+    """
+    parsed_data = type_coerce(Expense.parsed_data, JSON)
+    rows = (
+        db_session.query(
+            parsed_data['total_amount'].as_float(),
+            parsed_data['expense_type'].as_string(),
+            parsed_data['line_items']
+        )
+        .filter(Expense.user_id == user_id)
+        .order_by(Expense.created_at.desc(), Expense.id.desc())
+        .limit(limit)
+    )
+    
+    return [
+        {'total_amount': total_amount or 0, 'expense_type': expense_type, 'line_items': line_items or []}
+        for total_amount, expense_type, line_items in rows
+    ]
+
+def get_cached_insights(db_session, user_id: str, query: str, fingerprint: tuple) -> str:
+    """
+    Return insights for a query, running the AI analysis only on a cache miss.
+    Expenses are only loaded on a miss, so hits skip loading and decoding them.
+    """
+    direct_answer = answer_simple_insight_query(db_session, user_id, query)
+    if direct_answer is not None:
+        logger.info("Answered insight query from precomputed aggregates")
+        return direct_answer
+    
+    cache_key = (user_id, " ".join(query.lower().split()), fingerprint)
+    with _insight_cache_lock:
+        cached = _insight_cache.get(cache_key)
+    if cached is not None:
+        logger.info(f"Insight cache hit for user {user_id}")
+        return cached
+    
+    user_expenses = load_expenses_for_analysis(db_session, user_id)
+    try:
+        insights = tool_analyze_expenses_for_insights(query, user_expenses, cache_key=(user_id, fingerprint))
+    except PartialInsightError as e:
+        # Serve what we have, but don't cache it so the next request retries the failed parts
+        return e.partial_response
+    with _insight_cache_lock:
+        _insight_cache[cache_key] = insights
+    return insights
+
+# --- Insight Fast Path ---
+
+# Simple factual questions are answered from the precomputed dashboard columns
+# without an AI call. Anything that doesn't match goes to the AI as before.
+CATEGORY_SPEND_QUERY_RE = re.compile(r"\b(?:spent|spend|spending)\b.*\bon\s+([a-z][a-z &]*?)\s*(?:this month|last month)?\??$")
+# Only the plain question shapes count as a monthly total, e.g. "how much did I spend this month?"
+# or "what is my total spending last month"; a looser match would also catch breakdowns
+MONTH_TOTAL_QUERY_RE = re.compile(
+    r"^(?:how much (?:did|have) i (?:spent|spend)(?: in total)?"
+    r"|what(?:'s| is| was) my total(?: spending| spend| expenses?)?) (this|last) month\??$"
+)
+# Questions asking for analysis rather than a single number always go to the AI,
+# including comparisons ("more this month than last month?") and breakdowns
+ANALYTICAL_QUERY_RE = re.compile(
+    r"\b(?:compare|compared|comparison|vs|versus|more|less|than|trend|why|average|most|least"
+    r"|save|saving|budget|should|advice|tips?|breakdown|break down|by category|per|each|daily"
+    r"|income|list|show)\b"
+    r"|\bthis\s+month\b.*\blast\s+month\b|\blast\s+month\b.*\bthis\s+month\b"
+)
+
+def format_inr(amount: float) -> str:
+    return f"₹{amount:,.2f}"
+
+def answer_simple_insight_query(db_session, user_id: str, query: str) -> Optional[str]:
+    """Answer monthly-total and per-category spending questions directly, or return None."""
+    normalized_query = " ".join(query.lower().split())
+    if (len(normalized_query.split()) > 12 or ANALYTICAL_QUERY_RE.search(normalized_query)
+            or any(keyword in normalized_query for keyword in COMPLEX_QUERY_KEYWORDS)):
+        return None
+    
+    now = datetime.now()
+    this_month = now.strftime('%Y-%m')
+    last_month = (datetime(now.year, now.month, 1) - timedelta(days=1)).strftime('%Y-%m')
+    
+    category_match = CATEGORY_SPEND_QUERY_RE.search(normalized_query)
+    if category_match:
+        category = _match_category_name(category_match.group(1))
+        if category is None:
+            return None
+        
+        backfill_expense_aggregates(user_id)
+        month = this_month if 'this month' in normalized_query else (
+            last_month if 'last month' in normalized_query else None
+        )
+        expenses_query = db_session.query(Expense.category_json).filter(Expense.user_id == user_id)
+        if month:
+            expenses_query = expenses_query.filter(Expense.month == month)
+        
+        total = 0
+        for (category_json,) in expenses_query.yield_per(STREAM_BATCH_SIZE):
+            total += orjson.loads(category_json).get(category.value, 0)
+        
+        period = {this_month: " this month", last_month: " last month"}.get(month, "")
+        return f"Your share of {category.value} expenses{period} is {format_inr(total)}."
+    
+    total_match = MONTH_TOTAL_QUERY_RE.match(normalized_query)
+    if total_match:
+        period = f"{total_match.group(1)} month"
+        month = this_month if period == "this month" else last_month
+        backfill_expense_aggregates(user_id)
+        count, total = db_session.query(
+            func.count(Expense.id), func.sum(Expense.user_portion)
+        ).filter(Expense.user_id == user_id, Expense.month == month).one()
+        return f"Your share of expenses {period} is {format_inr(total or 0)} across {count} expenses."
+    
+    return None
+
+# Shortest category prefix ("gro", "ent") accepted without the AI; shorter ones are too ambiguous
+MIN_CATEGORY_PREFIX_LENGTH = 3
+
+def _match_category_name(name: str) -> Optional[ExpenseCategory]:
+    """Resolve a category mentioned in a query ("groceries", "food", "travel") to an ExpenseCategory."""
+    name = name.strip().casefold()
+    if not name:
+        return None
+    for category in ExpenseCategory:
+        category_name = category.value.casefold()
+        if (name == category_name or name in category_name.split()
+                or (len(name) >= MIN_CATEGORY_PREFIX_LENGTH and category_name.startswith(name))):
+            return category
+    return None
+
 # --- Main Orchestrator for Parsing ---
 
 def calculate_user_allocations(line_items: List[dict]) -> dict:
@@ -908,62 +1597,153 @@ def calculate_user_allocations(line_items: List[dict]) -> dict:
     Calculate total allocation for each user across all line items.
     This is a core feature for expense splitting.
     """
-    user_totals = {}
+    user_totals = defaultdict(float)
     
     for item in line_items:
-        splits = item.get('splits', [])
-        for split in splits:
-            participant = split.get('participant', '')
-            amount = split.get('amount', 0)
-            
-            if participant in user_totals:
-                user_totals[participant] += amount
-            else:
-                user_totals[participant] = amount
+        for split in item.get('splits', ()):
+            split_get = split.get
+            user_totals[split_get('participant', '')] += split_get('amount', 0)
     
     # Round to 2 decimal places
-    for participant in user_totals:
-        user_totals[participant] = round(user_totals[participant], 2)
-    
-    return user_totals
+    return {participant: round(total, 2) for participant, total in user_totals.items()}
 
 def calculate_user_allocation_breakdown(line_items: List[dict]) -> dict:
     """
     Calculate item-level allocation breakdown grouped by user.
     Shows exactly which items each person is paying for and how much.
     """
-    user_breakdown = {}
+    user_breakdown = defaultdict(list)
     
     for item in line_items:
         item_description = item.get('description', 'Unknown Item')
-        splits = item.get('splits', [])
+        item_total = item.get('amount', 0)
         
-        for split in splits:
-            participant = split.get('participant', '')
+        for split in item.get('splits', ()):
             amount = split.get('amount', 0)
             
             if amount > 0:  # Only include if user actually pays something
-                if participant not in user_breakdown:
-                    user_breakdown[participant] = []
-                
-                user_breakdown[participant].append({
+                user_breakdown[split.get('participant', '')].append({
                     'item': item_description,
                     'amount': round(amount, 2),
-                    'item_total': item.get('amount', 0)
+                    'item_total': item_total
                 })
     
-    return user_breakdown
+    return dict(user_breakdown)
+
+# Participant names that refer to the user; stored splits use the canonical 'me'
+_ME_ALIASES = frozenset(('me', 'myself', 'i', 'user', 'you'))
+
+def canonicalize_split_participants(line_items: List[dict]) -> None:
+    """Rewrite every alias of the user in the items' splits to the canonical 'me'."""
+    for item in line_items:
+        for split in item.get('splits', ()):
+            participant = split.get('participant', '')
+            if participant != 'me' and participant.lower() in _ME_ALIASES:
+                split['participant'] = 'me'
+
+def compute_expense_aggregates(parsed_data: dict) -> dict:
+    """
+    Compute the precomputed dashboard columns of an expense from its parsed data,
+    so the dashboard can aggregate in SQL instead of re-parsing every expense.
+    The month column comes from created_at and is set by the caller.
+    """
+    line_items = parsed_data.get('line_items', [])
+    
+    # Use existing user_allocations if available, otherwise calculate
+    user_allocations = parsed_data.get('user_allocations')
+    if not user_allocations:
+        user_allocations = calculate_user_allocations(line_items)
+    
+    # User's share of each category
+    category_totals = {}
+    for item in line_items:
+        item_user_amount = sum(
+            split.get('amount', 0) for split in item.get('splits', [])
+            if split.get('participant') == 'me'
+        )
+        if item_user_amount > 0:
+            # Use AI-determined category if available, otherwise fallback to description-based
+            category = categorize_line_item(item.get('description', ''), item.get('category'))
+            category_totals[category] = category_totals.get(category, 0) + item_user_amount
+    
+    return {
+        'user_portion': user_allocations.get('me', 0),
+        'category_json': orjson.dumps(category_totals).decode(),
+        'expense_type': parsed_data.get('expense_type', 'personal')
+    }
+
+def apply_expense_aggregates(expense: Expense, parsed_data: dict) -> None:
+    """Fill in the precomputed dashboard columns of an existing Expense row."""
+    if expense.created_at is None:
+        expense.created_at = datetime.utcnow()
+    
+    for column, value in compute_expense_aggregates(parsed_data).items():
+        setattr(expense, column, value)
+    expense.month = expense.created_at.strftime('%Y-%m')
+
+def backfill_expense_aggregates(user_id: str) -> None:
+    """
+    Compute the dashboard columns for a user's expenses stored before those columns existed.
+    Pending rows are looked for on the reader, so the single writer is only taken when
+    there is something to backfill.
+    """
+    is_pending = (Expense.user_id == user_id, Expense.user_portion.is_(None))
+    has_pending = get_db_session(readonly=True).query(
+        select(Expense.id).where(*is_pending).exists()
+    ).scalar()
+    if not has_pending:
+        return
+    
+    db_session = get_db_session()
+    pending_expenses = db_session.query(Expense).filter(*is_pending).all()
+    for expense in pending_expenses:
+        parsed_data = expense.parsed
+        # Rows stored before participants were canonicalized may use aliases like "Me";
+        # their stored user_allocations use the same aliases, so recompute them too
+        line_items = parsed_data.get('line_items', [])
+        canonicalize_split_participants(line_items)
+        parsed_data['user_allocations'] = calculate_user_allocations(line_items)
+        apply_expense_aggregates(expense, parsed_data)
+    # Committing also hands the writer connection back to the pool
+    db_session.commit()
+    logger.info(f"Backfilled dashboard aggregates for {len(pending_expenses)} expenses")
+
+LINE_ITEM_FIELDS = frozenset(LineItem.__struct_fields__)
+SPLIT_FIELDS = frozenset(Split.__struct_fields__)
 
-def run_expense_agent(text: str) -> dict:
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def is_well_formed_line_item(item_data: dict) -> bool:
+    """
+    True if an item already has exactly the LineItem shape and its splits add up,
+    so the repair pass and msgspec validation would leave it unchanged.
+    """
+    splits = item_data.get('splits')
+    if item_data.keys() != LINE_ITEM_FIELDS or not splits or not isinstance(splits, list):
+        return False
+    if not (isinstance(item_data['description'], str) and _is_number(item_data['amount'])
+            and isinstance(item_data['category'], str) and item_data['allocation_text']
+            and isinstance(item_data['allocation_text'], str)):
+        return False
+    for split in splits:
+        if not (isinstance(split, dict) and split.keys() == SPLIT_FIELDS
+                and isinstance(split['participant'], str) and _is_number(split['amount'])):
+            return False
+    return abs(math.fsum(split['amount'] for split in splits) - item_data['amount']) <= 0.01
+
+def run_expense_agent(text: str, parsed_result: Optional[dict] = None) -> dict:
     """
     Advanced AI-powered expense parsing orchestrator.
     Uses intelligent step-by-step reasoning to handle dynamic natural language input.
+    A parsed_result already produced for the text (e.g. by a batched call) skips the parser.
     """
     logger.info("Starting intelligent expense agent orchestration")
     start_time = time.time()
     try:
-        # Use the new intelligent parser for complete expense analysis
-        parsed_result = tool_intelligent_expense_parser(text)
+        if parsed_result is None:
+            # Use the new intelligent parser for complete expense analysis
+            parsed_result = tool_intelligent_expense_parser(text)
         
         # Validate and ensure required fields
         participants = parsed_result.get('participants', ['me'])
@@ -974,36 +1754,46 @@ def run_expense_agent(text: str) -> dict:
         line_items_data = parsed_result.get('line_items', [])
         total_amount = parsed_result.get('total_amount', 0)
         
-        # Convert line items to Pydantic models for validation
-        processed_line_items = []
-        calculated_total = 0
-        
-        for item_data in line_items_data:
-            # Ensure required fields
-            if not item_data.get('allocation_text'):
-                item_data['allocation_text'] = item_data.get('description', 'Personal expense')
-            
-            # Validate splits
-            splits = item_data.get('splits', [])
-            if not splits:
-                # Fallback: create a split for "me" with full amount
-                splits = [{'participant': 'me', 'amount': item_data.get('amount', 0)}]
-                item_data['splits'] = splits
+        if all(is_well_formed_line_item(item_data) for item_data in line_items_data):
+            # Warm path: the parser already produced consistent, LineItem-shaped items
+            line_items_dict = line_items_data
+            calculated_total = math.fsum(item_data['amount'] for item_data in line_items_data)
+        else:
+            # Convert line items to msgspec structs for validation
+            processed_line_items = []
+            calculated_total = 0
             
-            # Ensure splits sum to item amount
-            split_total = sum(split.get('amount', 0) for split in splits)
-            item_amount = item_data.get('amount', 0)
-            if abs(split_total - item_amount) > 0.01:  # Allow small rounding differences
-                logger.warning(f"Split total {split_total} doesn't match item amount {item_amount}, adjusting...")
-                # Adjust the first split to make totals match
-                if splits:
-                    adjustment = item_amount - split_total
-                    splits[0]['amount'] = splits[0].get('amount', 0) + adjustment
+            for item_data in line_items_data:
+                # Ensure required fields
+                if not item_data.get('allocation_text'):
+                    item_data['allocation_text'] = item_data.get('description', 'Personal expense')
+                
+                # Validate splits
+                splits = item_data.get('splits', [])
+                if not splits:
+                    # Fallback: create a split for "me" with full amount
+                    splits = [{'participant': 'me', 'amount': item_data.get('amount', 0)}]
                     item_data['splits'] = splits
+                
+                # Ensure splits sum to item amount
+                split_total = math.fsum(split.get('amount', 0) for split in splits)
+                item_amount = item_data.get('amount', 0)
+                if abs(split_total - item_amount) > 0.01:  # Allow small rounding differences
+                    logger.warning(f"Split total {split_total} doesn't match item amount {item_amount}, adjusting...")
+                    # Adjust the first split to make totals match
+                    if splits:
+                        adjustment = item_amount - split_total
+                        splits[0]['amount'] = splits[0].get('amount', 0) + adjustment
+                        item_data['splits'] = splits
+                
+                item_with_splits = msgspec.convert(item_data, LineItem, strict=False)
+                processed_line_items.append(item_with_splits)
+                calculated_total += item_data.get('amount', 0)
             
-            item_with_splits = LineItem(**item_data)
-            processed_line_items.append(item_with_splits)
-            calculated_total += item_data.get('amount', 0)
+            line_items_dict = msgspec.to_builtins(processed_line_items)
+        
+        # Store the user under one name so allocations and the dashboard can match on 'me'
+        canonicalize_split_participants(line_items_dict)
         
         # Use calculated total if provided total seems incorrect
         if abs(calculated_total - total_amount) > 0.01:
@@ -1011,7 +1801,6 @@ def run_expense_agent(text: str) -> dict:
             logger.info(f"Adjusted total amount to calculated value: {total_amount}")
         
         # Calculate grouped user allocations - CORE FEATURE
-        line_items_dict = [item.model_dump() for item in processed_line_items]
         user_allocations = calculate_user_allocations(line_items_dict)
         user_allocation_breakdown = calculate_user_allocation_breakdown(line_items_dict)
         
@@ -1047,8 +1836,36 @@ def run_expense_agent(text: str) -> dict:
         logger.error(f"Critical error in run_expense_agent: {e}\nTraceback: {traceback.format_exc()}")
         return {'error': True, 'message': f"An unexpected critical error occurred: {e}"}
 
+def run_expense_agent_batch(texts: List[str]) -> List[dict]:
+    """
+    Batch version of run_expense_agent. Simple texts skip the AI entirely and the rest
+    share batched analysis calls; anything a batch can't handle is parsed on its own.
+    """
+    parsed_results = [parse_simple_expense(text) for text in texts]
+    pending = [i for i, parsed_result in enumerate(parsed_results) if parsed_result is None]
+    
+    for start in range(0, len(pending), MAX_EXPENSE_TEXTS_PER_CALL):
+        chunk = pending[start:start + MAX_EXPENSE_TEXTS_PER_CALL]
+        analyses = analyze_expense_texts([texts[i] for i in chunk])
+        for i, analysis in zip(chunk, analyses):
+            if analysis is not None:
+                parsed_results[i] = build_result_from_analysis(analysis)
+    
+    return [run_expense_agent(text, parsed_result) for text, parsed_result in zip(texts, parsed_results)]
+
 # --- Flask API Endpoints ---
 
+@app.errorhandler(Exception)
+def handle_unexpected_error(e):
+    """
+    Turns any exception an endpoint doesn't handle into a JSON 500.
+    HTTP errors (404, 405, ...) keep Flask's own responses.
+    """
+    if isinstance(e, HTTPException):
+        return e
+    logger.exception(f"Unhandled error in {request.method} {request.path}: {e}")
+    return jsonify({'error': 'Internal server error', 'message': str(e)}), 500
+
 @app.route("/health", methods=["GET"])
 def health_check():
     """Simple endpoint to check if the server is running."""
@@ -1075,44 +1892,154 @@ def parse_expense():
     
     if result.get('error'): return jsonify({'error': 'AI Processing Failed', 'message': result.get('message')}), 500
     
+    expense_values, serialized_result = build_expense_record(user_id, expense_text, result)
+    
+    # A plain INSERT ... RETURNING skips ORM instance tracking on the write path
+    db_session = get_db_session()
+    document_id = db_session.execute(
+        insert(Expense).values(**expense_values, **INSERT_TIMESTAMP_VALUES).returning(Expense.id)
+    ).scalar_one()
+    db_session.commit()
+    
+    body = b'{"message":"Expense parsed and stored successfully","document_id":%d,%s' % (
+        document_id, serialized_result[1:]
+    )
+    return Response(body, status=200, mimetype='application/json')
+
+def build_expense_record(user_id: str, expense_text: str, result: dict) -> tuple:
+    """
+    Build the Expense column values for a successful agent result.
+    Returns them with the serialized result so callers can reuse the bytes in responses.
+    """
     # Parse the expense date if provided
     expense_date = None
     if result.get('expense_date'):
         try:
-            from datetime import datetime
             expense_date = datetime.fromisoformat(result['expense_date'])
         except (ValueError, TypeError):
             logger.warning(f"Invalid date format: {result.get('expense_date')}, using current date")
     
-    db_session = get_db_session()
-    new_expense = Expense(
-        user_id=user_id, 
-        original_text=expense_text, 
-        parsed_data=json.dumps(result), 
-        status='completed',
-        expense_date=expense_date  # Use parsed date or None (defaults to created_at)
-    )
-    db_session.add(new_expense)
-    db_session.commit()
+    result.pop('error', None) # Remove internal flag before storing and returning to user
     
-    document_id = new_expense.id
-    del result['error'] # Remove internal flag before returning to user
+    # Serialize once: the same bytes are stored and spliced into the response body
+    serialized_result = orjson.dumps(result)
     
-    return jsonify({'message': 'Expense parsed and stored successfully', 'document_id': document_id, **result}), 200
+    expense_values = {
+        'user_id': user_id,
+        'original_text': expense_text,
+        'parsed_data': serialized_result.decode(),
+        'status': 'completed',
+        'expense_date': expense_date,  # Use parsed date or None (defaults to created_at)
+        **compute_expense_aggregates(result)
+    }
+    return expense_values, serialized_result
+
+# created_at is taken from SQLite's clock within the INSERT itself, so no Python datetime is
+# built per row; it's passed explicitly because tables created before the column had a
+# server default can't gain one. month is derived from the same clock in the same statement.
+INSERT_TIMESTAMP_VALUES = {
+    'created_at': func.current_timestamp(),
+    'month': func.strftime('%Y-%m', func.current_timestamp())
+}
+
+# Upper bound on texts accepted by one batch request
+MAX_BATCH_EXPENSE_TEXTS = 50
+
+@app.route("/parse-expense/batch", methods=["POST"])
+@require_auth
+def parse_expense_batch():
+    """Parses several natural language expenses with batched AI calls and stores them in one transaction."""
+    if not model: return jsonify({'error': 'Service configuration error'}), 503
+    
+    data = request.get_json()
+    texts = data.get('texts')
+    user_id = request.user_id
+    
+    if not isinstance(texts, list) or not texts or not all(isinstance(text, str) and text.strip() for text in texts):
+        return jsonify({'error': 'texts must be a non-empty list of non-empty strings'}), 400
+    if len(texts) > MAX_BATCH_EXPENSE_TEXTS:
+        return jsonify({'error': f'At most {MAX_BATCH_EXPENSE_TEXTS} texts per batch'}), 400
+    
+    results = run_expense_agent_batch(texts)
+    
+    stored_values = []
+    stored_results = []
+    response_items = []
+    for expense_text, result in zip(texts, results):
+        if result.get('error'):
+            response_items.append({'error': 'AI Processing Failed', 'message': result.get('message'), 'text': expense_text})
+            continue
+        expense_values, _ = build_expense_record(user_id, expense_text, result)
+        stored_values.append(expense_values)
+        stored_results.append(result)
+        response_items.append(result)
+    
+    if stored_values:
+        db_session = get_db_session()
+        document_ids = db_session.scalars(
+            insert(Expense).values(INSERT_TIMESTAMP_VALUES).returning(Expense.id, sort_by_parameter_order=True),
+            stored_values
+        ).all()
+        db_session.commit()
+        
+        for result, document_id in zip(stored_results, document_ids):
+            result['document_id'] = document_id
+    
+    return jsonify({
+        'message': f'{len(stored_values)} of {len(texts)} expenses parsed and stored successfully',
+        'count': len(stored_values),
+        'results': response_items
+    }), 200
+
+# Rows fetched per round trip when streaming list endpoints
+STREAM_BATCH_SIZE = 500
+# Encoded rows are buffered up to roughly this many characters per streamed chunk,
+# so the server isn't writing a separate tiny chunk for every row
+STREAM_CHUNK_SIZE = 64 * 1024
+
+def stream_json_list(list_key: str, rows, encode_row) -> Response:
+    """
+    Streams {"status": "success", <list_key>: [...], "count": N} in chunks of encoded rows,
+    so large result sets are never held in memory as a whole.
+    """
+    def generate():
+        buffer = [f'{{"status":"success","{list_key}":[']
+        buffered_size = 0
+        count = 0
+        for row in rows:
+            encoded = (',' if count else '') + encode_row(row)
+            buffer.append(encoded)
+            buffered_size += len(encoded)
+            count += 1
+            if buffered_size >= STREAM_CHUNK_SIZE:
+                yield ''.join(buffer)
+                buffer.clear()
+                buffered_size = 0
+        buffer.append(f'],"count":{count}}}')
+        yield ''.join(buffer)
+    
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
+def encode_expense_row(expense: Expense) -> str:
+    """Encodes an expense as JSON, splicing in the stored parsed_data text without decoding it."""
+    fields = expense.to_dict()
+    parsed_data = fields.pop('parsed_data')
+    return f'{orjson.dumps(fields).decode()[:-1]},"parsed_data":{parsed_data}}}'
 
 @app.route("/expenses", methods=["GET"])
 @require_auth
 def get_expenses():
     """Retrieves all stored expenses for the authenticated user."""
     user_id = request.user_id
-    db_session = get_db_session()
-    user_expenses = db_session.query(Expense).filter_by(user_id=user_id).order_by(Expense.created_at.desc()).all()
+    db_session = get_db_session(readonly=True)
+    user_expenses = (
+        db_session.query(Expense)
+        .filter_by(user_id=user_id)
+        .order_by(Expense.created_at.desc(), Expense.id.desc())
+        .yield_per(STREAM_BATCH_SIZE)
+    )
     
-    expenses_list = [exp.to_dict() for exp in user_expenses]
-    for exp in expenses_list:
-        exp['parsed_data'] = json.loads(exp['parsed_data'])
-        
-    return jsonify({'status': 'success', 'count': len(expenses_list), 'expenses': expenses_list}), 200
+    return stream_json_list('expenses', user_expenses, encode_expense_row)
 
 @app.route("/expenses/<int:expense_id>/allocations", methods=["GET"])
 @require_auth
@@ -1120,40 +2047,46 @@ def get_expense_allocations(expense_id):
     """Get user allocations for a specific expense with item-level breakdown."""
     user_id = request.user_id
     
-    try:
-        db_session = get_db_session()
-        expense = db_session.query(Expense).filter_by(id=expense_id, user_id=user_id).first()
-        
-        if not expense:
-            return jsonify({'error': 'Expense not found'}), 404
-            
-        parsed_data = json.loads(expense.parsed_data)
-        line_items = parsed_data.get('line_items', [])
-        
-        # Calculate user allocations if not already present
-        user_allocations = parsed_data.get('user_allocations')
-        if not user_allocations:
-            user_allocations = calculate_user_allocations(line_items)
-        
-        # Calculate item-level breakdown if not already present
-        user_allocation_breakdown = parsed_data.get('user_allocation_breakdown')
-        if not user_allocation_breakdown:
-            user_allocation_breakdown = calculate_user_allocation_breakdown(line_items)
-        
-        return jsonify({
-            'status': 'success',
-            'expense_id': expense_id,
-            'user_allocations': user_allocations,  # Total per user
-            'user_allocation_breakdown': user_allocation_breakdown,  # Item-level breakdown
-            'total_amount': parsed_data.get('total_amount', 0),
-            'expense_type': parsed_data.get('expense_type', 'personal'),
-            'participants': parsed_data.get('participants', []),
-            'line_items': line_items
-        }), 200
-        
-    except Exception as e:
-        logger.error(f"Error getting expense allocations: {e}\nTraceback: {traceback.format_exc()}")
-        return jsonify({'error': 'Failed to get expense allocations', 'message': str(e)}), 500
+    db_session = get_db_session(readonly=True)
+    # Extract just the fields we return in SQL rather than decoding the whole document
+    parsed_data = type_coerce(Expense.parsed_data, JSON)
+    row = (
+        db_session.query(
+            parsed_data['line_items'],
+            parsed_data['user_allocations'],
+            parsed_data['user_allocation_breakdown'],
+            parsed_data['total_amount'].as_float(),
+            parsed_data['expense_type'].as_string(),
+            parsed_data['participants']
+        )
+        .filter(Expense.id == expense_id, Expense.user_id == user_id)
+        .first()
+    )
+    
+    if not row:
+        return jsonify({'error': 'Expense not found'}), 404
+    
+    line_items, user_allocations, user_allocation_breakdown, total_amount, expense_type, participants = row
+    line_items = line_items or []
+    
+    # Calculate user allocations if not already present
+    if not user_allocations:
+        user_allocations = calculate_user_allocations(line_items)
+    
+    # Calculate item-level breakdown if not already present
+    if not user_allocation_breakdown:
+        user_allocation_breakdown = calculate_user_allocation_breakdown(line_items)
+    
+    return jsonify({
+        'status': 'success',
+        'expense_id': expense_id,
+        'user_allocations': user_allocations,  # Total per user
+        'user_allocation_breakdown': user_allocation_breakdown,  # Item-level breakdown
+        'total_amount': total_amount or 0,
+        'expense_type': expense_type or 'personal',
+        'participants': participants or [],
+        'line_items': line_items
+    }), 200
 
 @app.route("/insights", methods=["POST"])
 @require_auth
@@ -1167,21 +2100,15 @@ def get_insights():
 
     if not query: return jsonify({'error': 'Missing query'}), 400
 
-    try:
-        db_session = get_db_session()
-        user_expenses_raw = db_session.query(Expense).filter_by(user_id=user_id).all()
-        
-        if not user_expenses_raw:
-            return jsonify({'insights': "You don't have any expense data yet. Please add some expenses first."}), 200
-
-        user_expenses_data = [json.loads(exp.parsed_data) for exp in user_expenses_raw]
-        insights = tool_analyze_expenses_for_insights(query, user_expenses_data)
-        
-        return jsonify({'status': 'success', 'query': query, 'insights': insights}), 200
+    db_session = get_db_session(readonly=True)
+    fingerprint = get_expense_fingerprint(db_session, user_id)
+    
+    if not fingerprint[0]:
+        return jsonify({'insights': "You don't have any expense data yet. Please add some expenses first."}), 200
 
-    except Exception as e:
-        logger.error(f"Error generating insights: {e}\nTraceback: {traceback.format_exc()}")
-        return jsonify({'error': 'Failed to generate insights', 'message': str(e)}), 500
+    insights = get_cached_insights(db_session, user_id, query, fingerprint)
+    
+    return jsonify({'status': 'success', 'query': query, 'insights': insights}), 200
 
 @app.route("/dashboard/stats", methods=["GET"])
 @require_auth
@@ -1189,114 +2116,94 @@ def get_dashboard_stats():
     """Get dashboard statistics using improved user allocation calculations."""
     user_id = request.user_id
     
-    try:
-        db_session = get_db_session()
-        user_expenses = db_session.query(Expense).filter_by(user_id=user_id).all()
-        
-        if not user_expenses:
-            return jsonify({
-                'status': 'success',
-                'this_month_total': 0,
-                'last_month_total': 0,
-                'category_breakdown': [],
-                'personal_count': 0,
-                'shared_count': 0,
-                'total_expenses': 0
-            }), 200
-        
-        # Parse expenses and calculate stats using improved allocation logic
-        parsed_expenses = []
-        for exp in user_expenses:
-            parsed_data = json.loads(exp.parsed_data)
-            
-            # Use existing user_allocations if available, otherwise calculate
-            user_allocations = parsed_data.get('user_allocations')
-            if not user_allocations:
-                line_items = parsed_data.get('line_items', [])
-                user_allocations = calculate_user_allocations(line_items)
-            
-            # Get user's portion from allocations (much more accurate)
-            user_portion = user_allocations.get('me', 0)
-            
-            parsed_expenses.append({
-                'amount': parsed_data.get('total_amount', 0),
-                'user_portion': user_portion,  # NEW: Use calculated allocation
-                'type': parsed_data.get('expense_type', 'personal'),
-                'date': exp.created_at,
-                'line_items': parsed_data.get('line_items', []),
-                'user_allocations': user_allocations
-            })
-        
-        # Calculate monthly totals using accurate user portions
-        from datetime import datetime, timedelta
-        now = datetime.now()
-        current_month_start = datetime(now.year, now.month, 1)
-        
-        # Last month calculation
-        if now.month == 1:
-            last_month_start = datetime(now.year - 1, 12, 1)
-            last_month_end = datetime(now.year, 1, 1) - timedelta(days=1)
-        else:
-            last_month_start = datetime(now.year, now.month - 1, 1)
-            last_month_end = current_month_start - timedelta(days=1)
-        
-        this_month_total = 0
-        last_month_total = 0
-        category_totals = {}
-        personal_count = 0
-        shared_count = 0
-        
-        for expense in parsed_expenses:
-            # Count expense types
-            if expense['type'] == 'shared':
-                shared_count += 1
-            else:
-                personal_count += 1
-                
-            # Use the accurate user portion from allocations
-            user_portion = expense['user_portion']
-            
-            # Monthly totals (use accurate user portions)
-            if expense['date'] >= current_month_start:
-                this_month_total += user_portion
-                logger.info(f"Added ${user_portion:.2f} to this month total. New total: ${this_month_total:.2f}")
-                
-                # Category breakdown (this month only, using accurate user portions)
-                user_allocations = expense.get('user_allocations', {})
-                user_allocation_amount = user_allocations.get('me', 0)
-                
-                for item in expense['line_items']:
-                    # Calculate user's portion of this specific item
-                    item_user_amount = 0
-                    splits = item.get('splits', [])
-                    for split in splits:
-                        if split.get('participant', '').lower() in ['me', 'myself', 'i', 'user', 'you']:
-                            item_user_amount += split.get('amount', 0)
-                    
-                    if item_user_amount > 0:
-                        # Use AI-determined category if available, otherwise fallback to description-based
-                        ai_category = item.get('category')
-                        category = categorize_line_item(item.get('description', ''), ai_category)
-                        category_totals[category] = category_totals.get(category, 0) + item_user_amount
-                            
-            elif last_month_start <= expense['date'] <= last_month_end:
-                last_month_total += user_portion
-        
-        category_breakdown = [{'name': k, 'value': round(v, 2)} for k, v in category_totals.items()]
-        
+    backfill_expense_aggregates(user_id)
+    db_session = get_db_session(readonly=True)
+    
+    # Count expense types
+    type_counts = dict(
+        db_session.query(Expense.expense_type, func.count(Expense.id))
+        .filter_by(user_id=user_id)
+        .group_by(Expense.expense_type)
+        .all()
+    )
+    total_expenses = sum(type_counts.values())
+    
+    if not total_expenses:
         return jsonify({
             'status': 'success',
-            'this_month_total': round(this_month_total, 2),
-            'last_month_total': round(last_month_total, 2),
-            'category_breakdown': category_breakdown,
-            'personal_count': personal_count,
-            'shared_count': shared_count,
-            'total_expenses': len(user_expenses)
+            'this_month_total': 0,
+            'last_month_total': 0,
+            'category_breakdown': [],
+            'personal_count': 0,
+            'shared_count': 0,
+            'total_expenses': 0
         }), 200
-        
-    except Exception as e:
-        logger.error(f"Error getting dashboard stats: {e}\nTraceback: {traceback.format_exc()}")
-        return jsonify({'error': 'Failed to get dashboard statistics', 'message': str(e)}), 500
+    
+    shared_count = type_counts.get('shared', 0)
+    personal_count = total_expenses - shared_count
+    
+    # Monthly totals of the user's portions, aggregated in SQL over an indexed
+    # created_at range so older history is never scanned
+    now = datetime.now()
+    current_month_start = datetime(now.year, now.month, 1)
+    last_month_start = (current_month_start - timedelta(days=1)).replace(day=1)
+    
+    this_month_total, last_month_total = db_session.query(
+        func.sum(case((Expense.created_at >= current_month_start, Expense.user_portion), else_=0)),
+        func.sum(case((Expense.created_at < current_month_start, Expense.user_portion), else_=0))
+    ).filter(Expense.user_id == user_id, Expense.created_at >= last_month_start).one()
+    this_month_total = this_month_total or 0
+    last_month_total = last_month_total or 0
+    
+    # Category breakdown (this month only) merges the small per-expense totals
+    category_totals = {}
+    this_month_categories = db_session.query(Expense.category_json).filter(
+        Expense.user_id == user_id, Expense.created_at >= current_month_start
+    ).yield_per(STREAM_BATCH_SIZE)
+    for (category_json,) in this_month_categories:
+        for category, amount in orjson.loads(category_json).items():
+            category_totals[category] = category_totals.get(category, 0) + amount
+    
+    category_breakdown = [{'name': k, 'value': round(v, 2)} for k, v in category_totals.items()]
+    
+    return jsonify({
+        'status': 'success',
+        'this_month_total': round(this_month_total, 2),
+        'last_month_total': round(last_month_total, 2),
+        'category_breakdown': category_breakdown,
+        'personal_count': personal_count,
+        'shared_count': shared_count,
+        'total_expenses': total_expenses
+    }), 200
+
+# Keyword rules for the fallback categorizer, in priority order
+CATEGORY_KEYWORDS = [
+    (ExpenseCategory.FOOD_DINING, ['restaurant', 'cafe', 'coffee', 'tea', 'breakfast', 'lunch', 'dinner', 'snack', 'pizza', 'burger', 'dining', 'takeout', 'food delivery', 'meal']),
+    (ExpenseCategory.GROCERIES, ['grocery', 'supermarket', 'vegetables', 'rice', 'dal', 'flour', 'milk', 'bread']),
+    (ExpenseCategory.TRANSPORTATION, ['fuel', 'gas', 'petrol', 'uber', 'taxi', 'transport', 'bus', 'train', 'metro']),
+    (ExpenseCategory.SHOPPING, ['clothes', 'shopping', 'mall', 'store', 'electronics', 'phone', 'laptop']),
+    (ExpenseCategory.ENTERTAINMENT, ['movie', 'cinema', 'game', 'sports', 'entertainment', 'music', 'streaming']),
+    (ExpenseCategory.UTILITIES, ['utility', 'electricity', 'water', 'internet', 'bill', 'rent', 'wifi']),
+    (ExpenseCategory.HEALTHCARE, ['medicine', 'doctor', 'hospital', 'medical', 'pharmacy', 'health']),
+    (ExpenseCategory.EDUCATION, ['book', 'course', 'school', 'education', 'learning', 'study']),
+    (ExpenseCategory.TRAVEL, ['hotel', 'flight', 'vacation', 'travel', 'trip', 'tourism']),
+]
+
+# Short meal words only count as whole words (optionally plural): as substrings they
+# would put "Tuition teacher" or "Steam game" under Food & Dining
+WHOLE_WORD_KEYWORDS = frozenset(('coffee', 'tea', 'breakfast', 'lunch', 'dinner', 'snack'))
+
+def _keyword_pattern(word: str) -> str:
+    if word in WHOLE_WORD_KEYWORDS:
+        return rf"\b{re.escape(word)}s?\b"
+    return re.escape(word)
+
+# One pass over the description finds every keyword: the zero-width lookahead
+# tries all categories at each position, so overlapping keywords aren't missed.
+_CATEGORY_GROUP_NAMES = {f"c{i}": category for i, (category, _) in enumerate(CATEGORY_KEYWORDS)}
+CATEGORY_KEYWORDS_RE = re.compile("(?=" + "|".join(
+    f"(?P<c{i}>{'|'.join(map(_keyword_pattern, words))})" for i, (_, words) in enumerate(CATEGORY_KEYWORDS)
+) + ")")
 
 def categorize_line_item(description: str, ai_category: str = None) -> str:
     """
@@ -1312,47 +2219,15 @@ def categorize_line_item(description: str, ai_category: str = None) -> str:
             logger.warning(f"Invalid AI category '{ai_category}', using fallback")
     
     # Fallback: Simple rule-based categorization for legacy items
-    desc_lower = description.lower()
-    
-    # Food & Dining
-    if any(word in desc_lower for word in ['restaurant', 'cafe', 'pizza', 'burger', 'dining', 'takeout', 'food delivery', 'meal']):
-        return ExpenseCategory.FOOD_DINING.value
-    
-    # Groceries
-    elif any(word in desc_lower for word in ['grocery', 'supermarket', 'vegetables', 'rice', 'dal', 'flour', 'milk', 'bread']):
-        return ExpenseCategory.GROCERIES.value
-    
-    # Transportation
-    elif any(word in desc_lower for word in ['fuel', 'gas', 'petrol', 'uber', 'taxi', 'transport', 'bus', 'train', 'metro']):
-        return ExpenseCategory.TRANSPORTATION.value
-    
-    # Shopping
-    elif any(word in desc_lower for word in ['clothes', 'shopping', 'mall', 'store', 'electronics', 'phone', 'laptop']):
-        return ExpenseCategory.SHOPPING.value
-    
-    # Entertainment
-    elif any(word in desc_lower for word in ['movie', 'cinema', 'game', 'sports', 'entertainment', 'music', 'streaming']):
-        return ExpenseCategory.ENTERTAINMENT.value
+    matched_groups = {match.lastgroup for match in CATEGORY_KEYWORDS_RE.finditer(description.lower())}
     
-    # Utilities
-    elif any(word in desc_lower for word in ['utility', 'electricity', 'water', 'internet', 'bill', 'rent', 'wifi']):
-        return ExpenseCategory.UTILITIES.value
-    
-    # Healthcare
-    elif any(word in desc_lower for word in ['medicine', 'doctor', 'hospital', 'medical', 'pharmacy', 'health']):
-        return ExpenseCategory.HEALTHCARE.value
-    
-    # Education
-    elif any(word in desc_lower for word in ['book', 'course', 'school', 'education', 'learning', 'study']):
-        return ExpenseCategory.EDUCATION.value
-    
-    # Travel
-    elif any(word in desc_lower for word in ['hotel', 'flight', 'vacation', 'travel', 'trip', 'tourism']):
-        return ExpenseCategory.TRAVEL.value
+    # Earlier categories take precedence, as with the original if/elif chain
+    for group_name, category in _CATEGORY_GROUP_NAMES.items():
+        if group_name in matched_groups:
+            return category.value
     
     # Default to Miscellaneous
-    else:
-        return ExpenseCategory.MISCELLANEOUS.value
+    return ExpenseCategory.MISCELLANEOUS.value
 
 @app.route("/budget", methods=["GET", "POST"])
 @require_auth
@@ -1396,37 +2271,46 @@ def generate_and_store_insight():
 
     if not query: return jsonify({'error': 'Missing query'}), 400
 
-    try:
-        db_session = get_db_session()
-        user_expenses_raw = db_session.query(Expense).filter_by(user_id=user_id).all()
-        
-        if not user_expenses_raw:
-            return jsonify({'insights': "You don't have any expense data yet. Please add some expenses first."}), 200
+    # Read on the reader pool so the writer connection isn't held during the AI call
+    read_session = get_db_session(readonly=True)
+    fingerprint = get_expense_fingerprint(read_session, user_id)
+    
+    if not fingerprint[0]:
+        return jsonify({'insights': "You don't have any expense data yet. Please add some expenses first."}), 200
 
-        user_expenses_data = [json.loads(exp.parsed_data) for exp in user_expenses_raw]
-        insight_text = tool_analyze_expenses_for_insights(query, user_expenses_data)
-        
-        # Store the insight in database
-        new_insight = Insight(
-            user_id=user_id,
-            query=query,
-            insight_text=insight_text,
-            tags=tags
+    insight_text = get_cached_insights(read_session, user_id, query, fingerprint)
+    
+    # Store the insight in database
+    db_session = get_db_session()
+    insight_id, created_at = db_session.execute(
+        insert(Insight)
+        .values(
+            user_id=user_id, query=query, insight_text=insight_text,
+            tags=tags, tags_json=tags.split(',') if tags else [],
+            created_at=func.current_timestamp()
         )
-        db_session.add(new_insight)
-        db_session.commit()
-        
-        return jsonify({
-            'status': 'success',
-            'query': query,
-            'insight_text': insight_text,
-            'insight_id': new_insight.id,
-            'created_at': new_insight.created_at.isoformat()
-        }), 200
-
-    except Exception as e:
-        logger.error(f"Error generating and storing insight: {e}\nTraceback: {traceback.format_exc()}")
-        return jsonify({'error': 'Failed to generate insight', 'message': str(e)}), 500
+        .returning(Insight.id, Insight.created_at)
+    ).one()
+    db_session.commit()
+    
+    return jsonify({
+        'status': 'success',
+        'query': query,
+        'insight_text': insight_text,
+        'insight_id': insight_id,
+        'created_at': created_at
+    }), 200
+
+# Core select of plain rows: nothing is hydrated into ORM instances just to be serialized.
+# As a lambda statement it is built and cache-keyed once rather than on every request.
+USER_INSIGHTS_STMT = lambda_stmt(lambda: (
+    select(
+        Insight.id, Insight.user_id, Insight.query, Insight.insight_text,
+        Insight.created_at, Insight.tags_json.label('tags')
+    )
+    .where(Insight.user_id == bindparam('user_id'))
+    .order_by(Insight.created_at.desc(), Insight.id.desc())
+))
 
 @app.route("/insights", methods=["GET"])
 @require_auth
@@ -1434,21 +2318,16 @@ def get_all_insights():
     """Get all stored insights for the user."""
     user_id = request.user_id
     
-    try:
-        db_session = get_db_session()
-        user_insights = db_session.query(Insight).filter_by(user_id=user_id).order_by(Insight.created_at.desc()).all()
-        
-        insights_list = [insight.to_dict() for insight in user_insights]
-        
-        return jsonify({
-            'status': 'success',
-            'count': len(insights_list),
-            'insights': insights_list
-        }), 200
-        
-    except Exception as e:
-        logger.error(f"Error getting insights: {e}\nTraceback: {traceback.format_exc()}")
-        return jsonify({'error': 'Failed to get insights', 'message': str(e)}), 500
+    db_session = get_db_session(readonly=True)
+    user_insights = db_session.execute(
+        USER_INSIGHTS_STMT, {'user_id': user_id},
+        execution_options={'yield_per': STREAM_BATCH_SIZE}
+    ).mappings()
+    
+    return stream_json_list(
+        'insights', user_insights,
+        lambda insight: orjson.dumps({**insight, 'tags': insight['tags'] or []}).decode()
+    )
 
 @app.route("/insights/<int:insight_id>", methods=["DELETE"])
 @require_auth
@@ -1456,85 +2335,108 @@ def delete_insight(insight_id):
     """Delete a specific insight."""
     user_id = request.user_id
     
-    try:
-        db_session = get_db_session()
-        insight = db_session.query(Insight).filter_by(id=insight_id, user_id=user_id).first()
-        
-        if not insight:
-            return jsonify({'error': 'Insight not found'}), 404
-            
-        db_session.delete(insight)
-        db_session.commit()
-        
-        return jsonify({
-            'status': 'success',
-            'message': 'Insight deleted successfully'
-        }), 200
-        
-    except Exception as e:
-        logger.error(f"Error deleting insight: {e}\nTraceback: {traceback.format_exc()}")
-        return jsonify({'error': 'Failed to delete insight', 'message': str(e)}), 500
+    # One DELETE scoped to the user; no rows deleted means it doesn't exist or isn't theirs
+    db_session = get_db_session()
+    result = db_session.execute(
+        delete(Insight).where(Insight.id == insight_id, Insight.user_id == user_id)
+    )
+    db_session.commit()
+    
+    if result.rowcount == 0:
+        return jsonify({'error': 'Insight not found'}), 404
+    
+    return jsonify({
+        'status': 'success',
+        'message': 'Insight deleted successfully'
+    }), 200
 
 # --- Debug Endpoints ---
 
+def _debug_expenses_select():
+    # Plain row tuples of just the fields shown, extracted from parsed_data in SQL
+    parsed_data = type_coerce(Expense.parsed_data, JSON)
+    return (
+        select(
+            Expense.id,
+            Expense.original_text,
+            Expense.created_at,
+            parsed_data['expense_type'].as_string().label('expense_type'),
+            parsed_data['total_amount'].as_float().label('total_amount'),
+            parsed_data['participants'].label('participants'),
+            parsed_data['line_items'].label('line_items'),
+            parsed_data['user_allocations'].label('user_allocations'),
+            parsed_data['user_allocation_breakdown'].label('user_allocation_breakdown')
+        )
+        .where(Expense.user_id == bindparam('user_id'))
+        .limit(5)
+    )
+
+DEBUG_EXPENSES_STMT = lambda_stmt(_debug_expenses_select)
+
 @app.route("/debug/expenses", methods=["GET"])
 @require_auth
 def debug_expenses():
     """Debug endpoint to see raw expense data, splits, and user allocations with item-level breakdown."""
     user_id = request.user_id
     
-    try:
-        db_session = get_db_session()
-        user_expenses = db_session.query(Expense).filter_by(user_id=user_id).limit(5).all()
+    db_session = get_db_session(readonly=True)
+    user_expenses = db_session.execute(DEBUG_EXPENSES_STMT, {'user_id': user_id}).all()
+    
+    debug_data = []
+    for exp in user_expenses:
+        line_items = exp.line_items or []
         
-        debug_data = []
-        for exp in user_expenses:
-            parsed_data = json.loads(exp.parsed_data)
-            line_items = parsed_data.get('line_items', [])
-            
-            # Get or calculate user allocations
-            user_allocations = parsed_data.get('user_allocations')
-            if not user_allocations:
-                user_allocations = calculate_user_allocations(line_items)
-            
-            # Get or calculate user allocation breakdown
-            user_allocation_breakdown = parsed_data.get('user_allocation_breakdown')
-            if not user_allocation_breakdown:
-                user_allocation_breakdown = calculate_user_allocation_breakdown(line_items)
-            
-            # Calculate user's portion using the new grouped allocation
-            user_portion = user_allocations.get('me', 0)
-            
-            debug_data.append({
-                'id': exp.id,
-                'original_text': exp.original_text,
-                'expense_type': parsed_data.get('expense_type'),
-                'total_amount': parsed_data.get('total_amount'),
-                'user_portion_from_allocations': user_portion,
-                'user_allocations': user_allocations,  # Total per user
-                'user_allocation_breakdown': user_allocation_breakdown,  # NEW: Item breakdown
-                'created_at': exp.created_at.isoformat(),
-                'participants': parsed_data.get('participants', []),
-                'line_items_count': len(line_items),
-                'line_items_sample': line_items[:2],  # Show first 2 items
-            })
+        # Get or calculate user allocations
+        user_allocations = exp.user_allocations
+        if not user_allocations:
+            user_allocations = calculate_user_allocations(line_items)
         
-        return jsonify({
-            'status': 'success',
-            'debug_data': debug_data,
-            'explanation': {
-                'user_allocations': 'Total amount each person owes across all items',
-                'user_allocation_breakdown': 'Shows exactly which items each person is paying for and how much'
-            }
-        }), 200
+        # Get or calculate user allocation breakdown
+        user_allocation_breakdown = exp.user_allocation_breakdown
+        if not user_allocation_breakdown:
+            user_allocation_breakdown = calculate_user_allocation_breakdown(line_items)
         
-    except Exception as e:
-        logger.error(f"Error in debug endpoint: {e}\nTraceback: {traceback.format_exc()}")
-        return jsonify({'error': 'Debug failed', 'message': str(e)}), 500
+        # Calculate user's portion using the new grouped allocation
+        user_portion = user_allocations.get('me', 0)
+        
+        debug_data.append({
+            'id': exp.id,
+            'original_text': exp.original_text,
+            'expense_type': exp.expense_type,
+            'total_amount': exp.total_amount,
+            'user_portion_from_allocations': user_portion,
+            'user_allocations': user_allocations,  # Total per user
+            'user_allocation_breakdown': user_allocation_breakdown,  # NEW: Item breakdown
+            'created_at': exp.created_at,
+            'participants': exp.participants or [],
+            'line_items_count': len(line_items),
+            'line_items_sample': line_items[:2],  # Show first 2 items
+        })
+    
+    payload = {
+        'status': 'success',
+        'debug_data': debug_data,
+        'explanation': {
+            'user_allocations': 'Total amount each person owes across all items',
+            'user_allocation_breakdown': 'Shows exactly which items each person is paying for and how much'
+        }
+    }
+    
+    # Debug tools that ask for msgpack get a smaller body that's cheaper to encode; JSON stays the default
+    if request.accept_mimetypes.best_match(['application/json', 'application/msgpack']) == 'application/msgpack':
+        return Response(msgspec.msgpack.encode(payload), mimetype='application/msgpack')
+    return jsonify(payload), 200
 
 # --- Main Execution ---
 
+# Request threads for the production server; requests mostly wait on Vertex AI
+WSGI_THREADS = 8
+
 if __name__ == '__main__':
-    # Runs the Flask development server
-    # Accessible at http://127.0.0.1:5000
-    app.run(host='0.0.0.0', port=5002, debug=True)
+    # Accessible at http://127.0.0.1:5002
+    if os.environ.get('FLASK_DEBUG'):
+        # Flask development server with the reloader and debugger
+        app.run(host='0.0.0.0', port=5002, debug=True)
+    else:
+        from waitress import serve
+        serve(app, host='0.0.0.0', port=5002, threads=WSGI_THREADS)
@@ -2,9 +2,11 @@
 
 import os
 from datetime import datetime
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime
-from sqlalchemy.orm import sessionmaker, declarative_base
-from sqlalchemy.pool import StaticPool
+from functools import cached_property
+import orjson
+from sqlalchemy import create_engine, make_url, event, func, inspect, text, Column, Index, Integer, Float, String, Text, DateTime, JSON
+from sqlalchemy.orm import scoped_session, sessionmaker, declarative_base
+from sqlalchemy.pool import QueuePool
 
 # --- Database Configuration ---
 
@@ -13,19 +15,97 @@ basedir = os.path.abspath(os.path.dirname(__file__))
 # Define the database file path
 DATABASE_FILE = os.path.join(basedir, 'expenses.db')
 
-# The database URL for SQLite
-DATABASE_URL = f'sqlite:///{DATABASE_FILE}'
+# The database URL for SQLite; DATABASE_URL overrides it, e.g. to put the database
+# on tmpfs (sqlite:////dev/shm/seed.db) while seeding
+DATABASE_URL = os.environ.get('DATABASE_URL', f'sqlite:///{DATABASE_FILE}')
 
-# Create the SQLAlchemy engine
-# connect_args and StaticPool are needed to make SQLite work correctly in some environments like Flask
+def _read_only_url(database_url):
+    """
+    The same SQLite file opened read-only, for the reader pool.
+    The reader and writer pools must see one database, so only on-disk files are supported.
+    """
+    url = make_url(database_url)
+    path = url.database
+    if url.get_backend_name() != 'sqlite' or not path or path == ':memory:' or path.startswith('file:'):
+        raise ValueError(
+            f"DATABASE_URL must point at an on-disk SQLite file (e.g. sqlite:////dev/shm/seed.db), got {database_url!r}"
+        )
+    return f'sqlite:///file:{path}?mode=ro&uri=true'
+
+DATABASE_READ_URL = _read_only_url(DATABASE_URL)
+
+# JSON values extracted from parsed_data in queries are decoded with orjson
+def _json_serializer(value):
+    return orjson.dumps(value).decode()
+
+# Compiled SQL kept per engine, and prepared statements kept per sqlite3 connection,
+# sized so every statement the app issues stays cached instead of being recompiled
+QUERY_CACHE_SIZE = 1200
+SQLITE_STATEMENT_CACHE_SIZE = 256
+
+# Create the SQLAlchemy engines
+# SQLite allows one writer at a time, so writes share a single pooled connection
+# rather than several connections contending for the lock ("database is locked").
+# check_same_thread must be off for pooled connections to move between request threads.
 engine = create_engine(
     DATABASE_URL,
-    connect_args={'check_same_thread': False},
-    poolclass=StaticPool
+    connect_args={'check_same_thread': False, 'cached_statements': SQLITE_STATEMENT_CACHE_SIZE},
+    query_cache_size=QUERY_CACHE_SIZE,
+    json_serializer=_json_serializer,
+    json_deserializer=orjson.loads,
+    poolclass=QueuePool,
+    pool_size=1,
+    max_overflow=0,
+    pool_pre_ping=True
 )
 
-# Create a session factory
+# Reads get their own pool of read-only connections, which WAL lets run alongside the writer.
+# Overflow is unbounded so a request holding a reader never waits on another reader.
+read_engine = create_engine(
+    DATABASE_READ_URL,
+    connect_args={'check_same_thread': False, 'cached_statements': SQLITE_STATEMENT_CACHE_SIZE},
+    query_cache_size=QUERY_CACHE_SIZE,
+    json_serializer=_json_serializer,
+    json_deserializer=orjson.loads,
+    poolclass=QueuePool,
+    pool_size=max(4, os.cpu_count() or 1),
+    max_overflow=-1,
+    pool_pre_ping=True
+)
+
+def _set_common_pragmas(cursor):
+    """Writers wait on a busy lock instead of failing, and hot pages and temp tables stay in memory."""
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.execute("PRAGMA cache_size=-20000")  # ~20 MB page cache per connection
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA foreign_keys=ON")
+
+@event.listens_for(engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Switches SQLite to WAL so reads don't block on expense writes.
+    synchronous=NORMAL is durable under WAL and avoids an fsync on every commit.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    _set_common_pragmas(cursor)
+    cursor.close()
+
+@event.listens_for(read_engine, "connect")
+def _set_sqlite_read_pragmas(dbapi_connection, connection_record):
+    """Read-only connections can't change the journal mode; the writer has already set WAL."""
+    cursor = dbapi_connection.cursor()
+    _set_common_pragmas(cursor)
+    cursor.close()
+
+# Create session factories
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+# One session of each kind per request thread, released by remove_db_sessions()
+_request_sessions = scoped_session(SessionLocal)
+_request_read_sessions = scoped_session(ReadSessionLocal)
 
 # Base class for our declarative models
 Base = declarative_base()
@@ -37,24 +117,40 @@ class Expense(Base):
     __tablename__ = 'expenses'
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(String, nullable=False, index=True)
+    user_id = Column(String, nullable=False)
     original_text = Column(Text, nullable=False)
     # Store the complex parsed data as a JSON string
     parsed_data = Column(Text, nullable=False)
     status = Column(String(50), nullable=False, default='pending')
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, server_default=func.current_timestamp())  # Set by SQLite, in UTC
     expense_date = Column(DateTime, nullable=True)  # Date when the expense occurred
+    # Aggregates precomputed from parsed_data at write time for the dashboard
+    user_portion = Column(Float, nullable=True)  # The user's ("me") share of the total
+    category_json = Column(Text, nullable=True)  # JSON object of category -> user's share
+    month = Column(String(7), nullable=True)  # 'YYYY-MM' of created_at
+    expense_type = Column(String(20), nullable=True)  # 'personal' or 'shared'
+
+    # Per-user listings and date-range aggregates filter on user_id and scan created_at;
+    # the composite also serves plain user_id lookups, so user_id needs no index of its own
+    __table_args__ = (
+        Index('ix_expense_user_created', 'user_id', 'created_at'),
+    )
+
+    @cached_property
+    def parsed(self):
+        """parsed_data decoded once per instance; helpers share the dict rather than re-parsing."""
+        return orjson.loads(self.parsed_data)
 
     def to_dict(self):
-        """Converts the Expense model instance to a dictionary."""
+        """Converts the Expense model instance to a dictionary; datetimes are left for orjson to encode."""
         return {
             'id': self.id,
             'user_id': self.user_id,
             'original_text': self.original_text,
             'parsed_data': self.parsed_data,
             'status': self.status,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'expense_date': self.expense_date.isoformat() if self.expense_date else None
+            'created_at': self.created_at,
+            'expense_date': self.expense_date
         }
 
 class Insight(Base):
@@ -62,23 +158,37 @@ class Insight(Base):
     __tablename__ = 'insights'
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(String, nullable=False, index=True)
+    user_id = Column(String, nullable=False)
     query = Column(Text, nullable=False)
     insight_text = Column(Text, nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, server_default=func.current_timestamp())  # Set by SQLite, in UTC
     tags = Column(String(500))  # Comma-separated tags for categorization
+    tags_json = Column(JSON, default=list)  # The same tags as a JSON array, split once at write time
+
+    # The insight list filters on user_id and sorts by created_at
+    __table_args__ = (
+        Index('ix_insight_user_created', 'user_id', 'created_at'),
+    )
 
     def to_dict(self):
-        """Converts the Insight model instance to a dictionary."""
+        """Converts the Insight model instance to a dictionary; datetimes are left for orjson to encode."""
         return {
             'id': self.id,
             'user_id': self.user_id,
             'query': self.query,
             'insight_text': self.insight_text,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'tags': self.tags.split(',') if self.tags else []
+            'created_at': self.created_at,
+            'tags': self.tags_json or []
         }
 
+class LLMResponseCache(Base):
+    """SQLAlchemy model for persisted Vertex AI responses, keyed by a prompt digest."""
+    __tablename__ = 'llm_cache'
+
+    key = Column(String(64), primary_key=True)  # sha256 hex digest of the request
+    value = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
 # --- Database Utility Functions ---
 
 def init_db():
@@ -88,11 +198,58 @@ def init_db():
     It's safe to call this multiple times; it won't recreate existing tables.
     """
     Base.metadata.create_all(bind=engine)
+    _add_missing_columns()
+    _add_missing_indexes()
+    _backfill_insight_tags()
 
-def get_db_session():
+def _add_missing_columns():
     """
-    Provides a new database session.
-    This should be called for each request that needs database access.
+    Adds columns introduced after a table was first created.
+    create_all() only creates missing tables, so existing databases need an ALTER TABLE.
     """
-    return SessionLocal()
-
+    with engine.begin() as connection:
+        inspector = inspect(connection)
+        for table in Base.metadata.sorted_tables:
+            existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing_columns:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+
+def _add_missing_indexes():
+    """Creates indexes declared after a table was first created (create_all() skips existing tables)."""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+def _backfill_insight_tags():
+    """Fills tags_json for insights stored before it existed, splitting their CSV tags once."""
+    with SessionLocal() as session:
+        for insight in session.query(Insight).filter(Insight.tags_json.is_(None)):
+            insight.tags_json = insight.tags.split(',') if insight.tags else []
+        session.commit()
+
+def get_db_session(readonly=False):
+    """
+    Provides the database session for the current request thread.
+    Pass readonly=True for requests that only read, so they use the read-only pool
+    and never wait on the single writer connection.
+    """
+    return _request_read_sessions() if readonly else _request_sessions()
+
+def remove_db_sessions():
+    """Closes the current thread's sessions, returning their connections to the pools."""
+    _request_sessions.remove()
+    _request_read_sessions.remove()
+
+def get_cached_llm_response(key):
+    """Returns the persisted LLM response for a cache key, or None on a miss."""
+    with ReadSessionLocal() as session:
+        entry = session.get(LLMResponseCache, key)
+        return entry.value if entry else None
+
+def store_cached_llm_response(key, value):
+    """Persists an LLM response so it survives application restarts."""
+    with SessionLocal() as session:
+        session.merge(LLMResponseCache(key=key, value=value))
+        session.commit()
@@ -1,12 +1,26 @@
 # seed_db.py - Populates the database with dummy data.
+#
+# Seeding writes many rows in a burst. To keep the database on tmpfs while it runs,
+# start the server with DATABASE_URL=sqlite:////dev/shm/seed.db python app.py, then
+# once seeding is done run sqlite3 /dev/shm/seed.db ".backup expenses.db". The database
+# is in WAL mode, so copying seed.db alone can miss rows still in seed.db-wal.
 
 import requests
-import json
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 # The base URL of your running Flask application
 API_BASE_URL = "http://127.0.0.1:5002"
 
+# Requests in flight at once per user; the server overlaps their AI calls
+MAX_WORKERS = 4
+# Retries for rate-limited (429) responses, backing off exponentially between them
+MAX_RATE_LIMIT_RETRIES = 5
+
+# One keep-alive session reused for every request instead of a new connection per call
+session = requests.Session()
+session.headers.update({"Content-Type": "application/json"})
+
 # A list of diverse expense data for different users - optimized for reduced AI hits
 DUMMY_EXPENSES = {
     "user-one": [
@@ -52,36 +66,39 @@ Team lunch at food court: Regular thali ₹180 each for me, Yash, Kritika, Jain
     ]
 }
 
+def post_with_backoff(path, user_id, payload):
+    """POSTs a JSON payload as a user, backing off only when the server rate-limits us."""
+    headers = {"Authorization": f"Bearer {user_id}"}
+    delay = 1
+    for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+        response = session.post(f"{API_BASE_URL}{path}", headers=headers, json=payload)
+        if response.status_code != 429 or attempt == MAX_RATE_LIMIT_RETRIES:
+            break
+        time.sleep(delay)
+        delay *= 2
+    response.raise_for_status()  # Raises an exception for bad status codes (4xx or 5xx)
+    return response
+
 def seed_database():
     """Sends POST requests to the /parse-expense endpoint to fill the DB."""
     print("Starting to seed the database with dummy data...")
 
     for user_id, expenses in DUMMY_EXPENSES.items():
         print(f"\n--- Adding expenses for user: {user_id} ---")
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {user_id}"
-        }
         
-        for i, text in enumerate(expenses):
-            payload = {"text": str(text)}
-            try:
-                response = requests.post(
-                    f"{API_BASE_URL}/parse-expense",
-                    headers=headers,
-                    data=json.dumps(payload)
-                )
-                response.raise_for_status()  # Raises an exception for bad status codes (4xx or 5xx)
-                
-                print(f"  [{i+1}/{len(expenses)}] Successfully added expense: '{text[:40]}...'")
-                # Wait a moment to avoid overwhelming the server or hitting API rate limits
-                time.sleep(3)  # Reduced from 10 seconds to 3 seconds for faster processing
-                
-            except requests.exceptions.RequestException as e:
-                print(f"  [!] Error adding expense for {user_id}: {e}")
-                if e.response:
-                    print(f"  [!] Response Body: {e.response.text}")
-                break # Stop processing this user if an error occurs
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            futures = [
+                executor.submit(post_with_backoff, "/parse-expense", user_id, {"text": str(text)})
+                for text in expenses
+            ]
+            for i, (text, future) in enumerate(zip(expenses, futures)):
+                try:
+                    future.result()
+                    print(f"  [{i+1}/{len(expenses)}] Successfully added expense: '{text[:40]}...'")
+                except requests.exceptions.RequestException as e:
+                    print(f"  [!] Error adding expense for {user_id}: {e}")
+                    if e.response is not None:
+                        print(f"  [!] Response Body: {e.response.text}")
 
     print("\nDatabase seeding complete!")
 
@@ -126,45 +143,34 @@ def test_insights_api():
     
     for user_id, _ in DUMMY_EXPENSES.items():
         print(f"\n--- Generating insights for user: {user_id} ---")
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {user_id}"
-        }
         
-        for i, insight_data in enumerate(insights_queries):
-            try:
-                print(f"  [{i+1}/{len(insights_queries)}] Query: '{insight_data['query'][:50]}...'")
-                
-                # Hit the insights/generate endpoint to store insights
-                response = requests.post(
-                    f"{API_BASE_URL}/insights/generate",
-                    headers=headers,
-                    data=json.dumps(insight_data)
-                )
-                response.raise_for_status()
-                
-                result = response.json()
-                if result.get('status') == 'success':
-                    print(f"    ✅ Generated insight: '{result.get('insight_text', '')[:80]}...'")
-                    print(f"    📊 Insight ID: {result.get('insight_id')}")
-                else:
-                    print(f"    ❌ Failed to generate insight: {result.get('insights', 'Unknown error')}")
-                
-                # Small delay to avoid overwhelming the server
-                time.sleep(2)
-                
-            except requests.exceptions.RequestException as e:
-                print(f"    [!] Error generating insight: {e}")
-                if hasattr(e, 'response') and e.response:
-                    print(f"    [!] Response: {e.response.text}")
-                break
+        # Hit the insights/generate endpoint to store insights
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            futures = [
+                executor.submit(post_with_backoff, "/insights/generate", user_id, insight_data)
+                for insight_data in insights_queries
+            ]
+            for i, (insight_data, future) in enumerate(zip(insights_queries, futures)):
+                try:
+                    print(f"  [{i+1}/{len(insights_queries)}] Query: '{insight_data['query'][:50]}...'")
+                    result = future.result().json()
+                    if result.get('status') == 'success':
+                        print(f"    ✅ Generated insight: '{result.get('insight_text', '')[:80]}...'")
+                        print(f"    📊 Insight ID: {result.get('insight_id')}")
+                    else:
+                        print(f"    ❌ Failed to generate insight: {result.get('insights', 'Unknown error')}")
+                    
+                except requests.exceptions.RequestException as e:
+                    print(f"    [!] Error generating insight: {e}")
+                    if e.response is not None:
+                        print(f"    [!] Response: {e.response.text}")
         
         # Get all insights for this user to verify
         try:
             print(f"\n  📋 Fetching all insights for {user_id}...")
-            response = requests.get(
+            response = session.get(
                 f"{API_BASE_URL}/insights",
-                headers=headers
+                headers={"Authorization": f"Bearer {user_id}"}
             )
             response.raise_for_status()
             
@@ -193,7 +199,7 @@ def run_full_test_suite():
     
     # First, check if the server is healthy
     try:
-        health_check = requests.get(f"{API_BASE_URL}/health-check")
+        health_check = session.get(f"{API_BASE_URL}/health-check")
         if health_check.status_code == 200:
             print("✅ API server is healthy. Proceeding with full test suite.")
             
@@ -226,7 +232,7 @@ if __name__ == "__main__":
         if sys.argv[1] == "seed-only":
             # Just seed the database
             try:
-                health_check = requests.get(f"{API_BASE_URL}/health-check")
+                health_check = session.get(f"{API_BASE_URL}/health-check")
                 if health_check.status_code == 200:
                     print("API server is healthy. Proceeding with seeding only.")
                     seed_database()
@@ -239,7 +245,7 @@ if __name__ == "__main__":
         elif sys.argv[1] == "insights-only":
             # Just test insights API
             try:
-                health_check = requests.get(f"{API_BASE_URL}/health-check")
+                health_check = session.get(f"{API_BASE_URL}/health-check")
                 if health_check.status_code == 200:
                     print("API server is healthy. Testing insights API only.")
                     test_insights_api()